@@ -13,6 +13,15 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# The database of the application, unless another URL is configured
+if not config.get_main_option("sqlalchemy.url"):
+    from database import url as database_url
+
+    config.set_main_option(
+        "sqlalchemy.url",
+        database_url.render_as_string(hide_password=False).replace("%", "%%"),
+    )
+
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -0,0 +1,34 @@
+"""route bbox index added
+
+Revision ID: 5e0b8f3a61c4
+Revises: d41c7e9a5b23
+Create Date: 2026-10-18 10:02:17.540918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0b8f3a61c4'
+down_revision: Union[str, None] = 'd41c7e9a5b23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GiST index over the existing min/max columns, built from the current rows
+    op.create_index(
+        'ix_routes_bbox',
+        'routes',
+        [sa.text('box(point(min_lng, min_lat), point(max_lng, max_lat))')],
+        unique=False,
+        postgresql_using='gist',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_routes_bbox', table_name='routes', postgresql_using='gist')
@@ -6,10 +6,74 @@ Contains global variables and settings.
 import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Define root directory and download directory
 ROOT_DIR = Path(__file__).parent.parent
 DOWNLOAD_DIR = ROOT_DIR / "downloads"
 
+
+def get_bool_env(name: str, default: bool = False) -> bool:
+    """Read a boolean setting from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def get_required_env(name: str) -> str:
+    """Read a setting without a default from the environment or .env"""
+    value = os.getenv(name)
+    if value is None:
+        raise RuntimeError(f"{name} is not set, add it to the environment or .env")
+    return value
+
+
+# Serve the route endpoints from an async engine (asyncpg) instead of the
+# synchronous engine and its threadpool
+USE_ASYNC_DATABASE = get_bool_env("USE_ASYNC_DATABASE")
+
+# Database connection, the defaults match the local development database.
+# The password has no default, set it in the environment or .env.
+DATABASE_HOST = os.getenv("DATABASE_HOST", "localhost")
+DATABASE_PORT = int(os.getenv("DATABASE_PORT", "5432"))
+DATABASE_NAME = os.getenv("DATABASE_NAME", "cycling-routes")
+DATABASE_USER = os.getenv("DATABASE_USER", "cycling-routes")
+DATABASE_PASSWORD = get_required_env("DATABASE_PASSWORD")
+
+# Connection pool, per engine and per worker process. Checkouts beyond
+# pool size plus max overflow wait up to the pool timeout (seconds).
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+# Replace connections after this many seconds, -1 keeps them
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+# Test connections on checkout, so connections dropped by the server are
+# replaced instead of failing the request
+DATABASE_POOL_PRE_PING = get_bool_env("DATABASE_POOL_PRE_PING", True)
+# Server-side statement timeout in milliseconds, 0 disables it
+DATABASE_STATEMENT_TIMEOUT = int(os.getenv("DATABASE_STATEMENT_TIMEOUT", "30000"))
+# Executions of a query before psycopg prepares it server-side (psycopg
+# default 5). "none" disables prepared statements, which is needed behind
+# PgBouncer in transaction pooling mode.
+DATABASE_PREPARE_THRESHOLD = os.getenv("DATABASE_PREPARE_THRESHOLD", "5")
+
+# Seconds between checks of the data version in the database, which drop the
+# cached responses and indexes after an import by another process
+DATA_VERSION_POLL_INTERVAL = float(os.getenv("DATA_VERSION_POLL_INTERVAL", "2"))
+
+# Stored route heatmap, kept up to date by the imports
+HEATMAP_PATH = Path(os.getenv("HEATMAP_PATH", DOWNLOAD_DIR / "heatmap.npz"))
+
+# Bulk GPX processing: worker processes (default one per core) and the
+# number of routes written per transaction
+GPX_WORKERS = int(os.getenv("GPX_WORKERS", "0")) or os.cpu_count() or 1
+GPX_BATCH_SIZE = int(os.getenv("GPX_BATCH_SIZE", "200"))
+# Route data parsed from GPX files, keyed by the content hash of the file
+GPX_CACHE_DIR = Path(os.getenv("GPX_CACHE_DIR", DOWNLOAD_DIR / "gpx-cache"))
+
 # Default sources for Komoot routes
 DEFAULT_SOURCES = [
     "personal",
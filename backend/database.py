@@ -1,12 +1,156 @@
+import threading
+import time
+
+from config import (
+    DATABASE_HOST,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_NAME,
+    DATABASE_PASSWORD,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_PORT,
+    DATABASE_PREPARE_THRESHOLD,
+    DATABASE_STATEMENT_TIMEOUT,
+    DATABASE_USER,
+    USE_ASYNC_DATABASE,
+)
 from sqlalchemy import create_engine
 from sqlalchemy.engine import URL
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 url = URL.create(
-    drivername="postgresql",
-    username="cycling-routes",
-    host="localhost",
-    database="cycling-routes",
-    password="HYr5xe9j6cYANf",
+    drivername="postgresql+psycopg",
+    username=DATABASE_USER,
+    host=DATABASE_HOST,
+    port=DATABASE_PORT,
+    database=DATABASE_NAME,
+    password=DATABASE_PASSWORD,
+)
+
+
+class PoolMetrics:
+    """Counts and wait times of connection checkouts from a pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+class MeteredPoolMixin:
+    """
+    Times checkouts, which includes waiting for a free connection and opening
+    new connections
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class MeteredAsyncQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def get_pool_options() -> dict:
+    return dict(
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pool_recycle=DATABASE_POOL_RECYCLE,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+    )
+
+
+def get_connect_args() -> dict:
+    """psycopg connection arguments for the statement timeout and preparing"""
+    connect_args = {
+        "prepare_threshold": (
+            None
+            if DATABASE_PREPARE_THRESHOLD.lower() == "none"
+            else int(DATABASE_PREPARE_THRESHOLD)
+        )
+    }
+    if DATABASE_STATEMENT_TIMEOUT:
+        connect_args["options"] = f"-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}"
+    return connect_args
+
+
+def get_async_connect_args() -> dict:
+    """asyncpg connection arguments for the statement timeout and preparing"""
+    connect_args = {}
+    if DATABASE_PREPARE_THRESHOLD.lower() == "none":
+        connect_args["prepared_statement_cache_size"] = 0
+    if DATABASE_STATEMENT_TIMEOUT:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(DATABASE_STATEMENT_TIMEOUT)
+        }
+    return connect_args
+
+
+def get_pool_metrics(engine) -> dict:
+    """Utilisation and checkout wait times of the pool of an engine"""
+    pool = engine.pool
+    metrics = pool.metrics
+    capacity = pool.size() + DATABASE_MAX_OVERFLOW
+    requests = metrics.checkouts + metrics.timeouts
+    return {
+        "size": pool.size(),
+        "maxOverflow": DATABASE_MAX_OVERFLOW,
+        "checkedOut": pool.checkedout(),
+        "checkedIn": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilisation": pool.checkedout() / capacity if capacity else 0.0,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "waitSecondsTotal": metrics.wait_total,
+        "waitSecondsMax": metrics.wait_max,
+        "waitSecondsMean": metrics.wait_total / requests if requests else 0.0,
+    }
+
+
+engine = create_engine(
+    url,
+    poolclass=MeteredQueuePool,
+    connect_args=get_connect_args(),
+    **get_pool_options(),
 )
 
-engine = create_engine(url)
+# Only created when enabled, as it needs the asyncpg driver
+async_engine = (
+    create_async_engine(
+        url.set(drivername="postgresql+asyncpg"),
+        poolclass=MeteredAsyncQueuePool,
+        connect_args=get_async_connect_args(),
+        **get_pool_options(),
+    )
+    if USE_ASYNC_DATABASE
+    else None
+)
@@ -1,6 +1,9 @@
+import hashlib
 import json
 import logging
 import os
+import threading
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Configure logging
@@ -9,12 +12,31 @@ from logging_config import configure_logging
 logger = configure_logging()
 
 # Import configuration
-from config import DEFAULT_SOURCES, DOWNLOAD_DIR, ROOT_DIR
-from database import engine
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, WebSocketDisconnect
+from config import (
+    DATA_VERSION_POLL_INTERVAL,
+    DEFAULT_SOURCES,
+    DOWNLOAD_DIR,
+    ROOT_DIR,
+    USE_ASYNC_DATABASE,
+)
+from database import async_engine, engine, get_pool_metrics
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Request,
+    Response,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from komoot import API, TourStatus, TourType
 from models.models import (
+    ROUTE_SORT_KEYS,
+    DataVersion,
     KomootRoute,
     KomootRoutePublic,
     KomootRoutePublicWithRoutePoints,
@@ -22,10 +44,95 @@ from models.models import (
     RoutePublic,
 )
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.websockets import WebSocket
+from utils.cache import (
+    CachedResponse,
+    add_data_version_listener,
+    etag_matches,
+    get_data_version,
+    refresh_data_version,
+    response_cache,
+    watch_data_version,
+)
+from utils.compression import negotiate_encoding
+from utils.encoding import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    FORMAT_NDJSON,
+    FORMAT_POLYLINE,
+    MEDIA_TYPES,
+    dump_json,
+    encode_binary_record,
+    encode_polyline,
+    negotiate_format,
+)
+from utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, resolve_page
+from utils.heatmap import HEATMAP_MEDIA_TYPE
+from utils.route import zoom_to_tolerance
+from utils.spatial import Polygon, SegmentIndex, clip_points, expand_bounds
+from utils.tiles import (
+    MVT_BUFFER,
+    MVT_MEDIA_TYPE,
+    TileLayer,
+    clip_line,
+    encode_tile,
+    project,
+    tile_bounds,
+)
 from websockets.exceptions import ConnectionClosed
 
-app = FastAPI()
+
+def load_data_version() -> int:
+    with Session(engine) as session:
+        return DataVersion.get(session)
+
+
+# Held while a thread of start_segment_index_build runs
+_segment_index_builder = threading.Lock()
+
+
+def build_segment_index() -> None:
+    """
+    Build the segment index until it is up to date with the data version,
+    which an import may have bumped again during the build
+    """
+    try:
+        while Route.get_current_segment_index() is None:
+            with Session(engine) as session:
+                Route.get_segment_index(session)
+    except Exception as e:
+        logger.warning(f"Error building the segment index: {str(e)}")
+    finally:
+        _segment_index_builder.release()
+
+
+def start_segment_index_build() -> None:
+    """
+    Build the segment index in a daemon thread, unless a build is running
+    already, so requests don't pay for it after startup and imports
+    """
+    if _segment_index_builder.acquire(blocking=False):
+        threading.Thread(
+            target=build_segment_index, name="segment-index", daemon=True
+        ).start()
+
+
+add_data_version_listener(lambda version: start_segment_index_build())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Imports by the scripts and other workers bump the version in the
+    # database, polling it drops the responses and indexes they outdated
+    refresh_data_version(load_data_version)
+    start_segment_index_build()
+    stop = watch_data_version(load_data_version, DATA_VERSION_POLL_INTERVAL)
+    yield
+    stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
 router = APIRouter()
 app.include_router(router)
 
@@ -35,6 +142,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 
@@ -65,6 +173,175 @@ def get_session():
         yield session
 
 
+async def get_async_session():
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
+def cached_response(request: Request, key: tuple, render) -> Response:
+    """
+    Serve a response from the response cache, rendering and storing it on a
+    miss. Answers 304 Not Modified when If-None-Match matches the ETag.
+
+    Bodies are compressed in the encoding negotiated from Accept-Encoding
+    once, and kept in the cache next to the uncompressed body.
+
+    Args:
+        key: Endpoint and normalized parameters that determine the response
+        render: Function returning the CachedResponse for the current data
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        version = get_data_version()
+        entry = render()
+        response_cache.set(key, entry, version)
+
+    return send_cached(request, entry)
+
+
+async def cached_response_async(request: Request, key: tuple, render) -> Response:
+    """
+    Variant of cached_response for a render coroutine function, which should
+    only await its queries and serialize in the threadpool. The body is
+    compressed in the threadpool too, keeping the event loop free.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        version = get_data_version()
+        entry = await render()
+        response_cache.set(key, entry, version)
+
+    encoding = get_cached_encoding(request, entry)
+    if encoding is not None and encoding not in entry.encoded:
+        await run_in_threadpool(response_cache.get_body, entry, encoding)
+
+    return send_cached(request, entry)
+
+
+def get_cached_encoding(request: Request, entry: CachedResponse) -> str | None:
+    """Content encoding of a cached response negotiated from Accept-Encoding"""
+    if not entry.is_compressible():
+        return None
+    return negotiate_encoding(request.headers.get("accept-encoding"))
+
+
+def send_cached(request: Request, entry: CachedResponse) -> Response:
+    encoding = get_cached_encoding(request, entry)
+    etag = entry.get_etag(encoding)
+    headers = {**entry.headers, "ETag": etag, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    return Response(
+        response_cache.get_body(entry, encoding),
+        media_type=entry.media_type,
+        headers=headers,
+    )
+
+
+# Number of routes fetched per round trip when streaming
+STREAM_BATCH_SIZE = 100
+
+
+def get_route_points(
+    session: Session,
+    ids: list[int],
+    tolerance: float = None,
+    clip_bounds: tuple[list[float], list[float]] = None,
+) -> list[list]:
+    """Fetch the geometry of routes in bulk, optionally clipped to bounds"""
+    points_by_id = Route.get_route_points_by_ids(session, ids, tolerance)
+    route_points = [points_by_id.get(id) or [] for id in ids]
+    return clip_route_points(route_points, clip_bounds)
+
+
+def clip_route_points(
+    route_points: list[list], clip_bounds: tuple[list[float], list[float]] = None
+) -> list[list]:
+    if clip_bounds is None:
+        return route_points
+    return [clip_points(points, *clip_bounds) for points in route_points]
+
+
+def stream_routes(
+    session: Session,
+    batches,
+    tolerance: float = None,
+    clip_bounds: tuple[list[float], list[float]] = None,
+):
+    """Serialize batches of routes as newline delimited JSON"""
+    for routes in batches:
+        route_points = get_route_points(
+            session, [route.id for route in routes], tolerance, clip_bounds
+        )
+        yield encode_ndjson_routes(routes, route_points)
+
+
+async def stream_routes_async(
+    session: AsyncSession,
+    batches,
+    tolerance: float = None,
+    clip_bounds: tuple[list[float], list[float]] = None,
+):
+    """
+    Variant of stream_routes for batches from Route.get_all_async, which
+    clips and serializes in the threadpool
+    """
+    async for routes in batches:
+        route_points = await session.run_sync(
+            get_route_points, [route.id for route in routes], tolerance
+        )
+        yield await run_in_threadpool(
+            encode_ndjson_routes, routes, route_points, clip_bounds
+        )
+
+
+def encode_ndjson_routes(
+    routes: list[Route],
+    route_points: list[list],
+    clip_bounds: tuple[list[float], list[float]] = None,
+) -> bytes:
+    route_points = clip_route_points(route_points, clip_bounds)
+    return b"".join(
+        RoutePublic.model_validate(route, update={"route_points": points})
+        .model_dump_json(by_alias=True)
+        .encode()
+        + b"\n"
+        for route, points in zip(routes, route_points)
+    )
+
+
+def encode_routes(
+    routes: list[Route], route_points: list[list], response_format: str
+) -> bytes:
+    """Serialize routes with their geometry in a compact format"""
+    if response_format == FORMAT_POLYLINE:
+        content = []
+        for route, points in zip(routes, route_points):
+            data = RoutePublic.model_validate(
+                route, update={"route_points": None}
+            ).model_dump(mode="json", by_alias=True)
+            data["routePoints"] = encode_polyline(points or [])
+            content.append(data)
+
+        return json.dumps(content).encode()
+
+    if response_format == FORMAT_BINARY:
+        records = []
+        for route, points in zip(routes, route_points):
+            metadata = RoutePublic.model_validate(
+                route, update={"route_points": None}
+            ).model_dump_json(by_alias=True, exclude={"route_points"})
+            records.append(encode_binary_record(metadata.encode(), points or []))
+
+        return b"".join(records)
+
+    raise ValueError(f"Unsupported format: {response_format}")
+
+
 @router.get("/ws")
 def http_endpoint():
     return []
@@ -86,55 +363,543 @@ def home():
     return "response"
 
 
-@app.get("/route/{id}", response_model=RoutePublic)
-def get_route(*, session: Session = Depends(get_session), id: int):
-    route = Route.get_by_id(session, id)
+def get_route(*, session: Session = Depends(get_session), request: Request, id: int):
+    return cached_response(
+        request, ("route", id), lambda: render_route(Route.get_by_id(session, id))
+    )
+
+
+async def get_route_async(
+    *, session: AsyncSession = Depends(get_async_session), request: Request, id: int
+):
+    async def render():
+        route = await Route.get_by_id_async(session, id)
+        return await run_in_threadpool(render_route, route)
 
+    return await cached_response_async(request, ("route", id), render)
+
+
+def render_route(route: Route | None) -> CachedResponse:
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
-    return route
+    return CachedResponse(
+        RoutePublic.model_validate(route).model_dump_json(by_alias=True).encode(),
+        MEDIA_TYPES[FORMAT_JSON],
+    )
 
 
-@app.get("/routes", response_model=list[RoutePublic])
-def get_routes(
-    *,
-    session: Session = Depends(get_session),
+def parse_bounds(bounds: str | None) -> list[float] | None:
+    """Parse a "lng,lat" query parameter into [lat, lng]"""
+    return list(reversed([float(i) for i in bounds.split(",")])) if bounds else None
+
+
+def get_route_params(
+    request: Request,
     sport: str = None,
     collections: str = None,
     min_distance: float = None,
     max_distance: float = None,
     min_bounds: str = None,
     max_bounds: str = None,
+    zoom: float = None,
+    tolerance: float = None,
+    format: str = None,
+    exact: bool = True,
+    clip: bool = False,
+    margin: float = 0.25,
+    sort: str = None,
+    cursor: str = None,
     limit: int = 1000,
-):
+) -> dict:
+    """
+    Parse the query parameters of /routes.
+
+    Args:
+        zoom: Map zoom level, used to return a simplified route geometry
+        tolerance: Maximum deviation in degrees of the returned geometry,
+            takes precedence over zoom
+        format: Geometry format (json, polyline, binary or ndjson), negotiated
+            from the Accept header if omitted. ndjson streams one route per
+            line while the rows are still being read.
+        exact: Only return routes whose line crosses the bounds, instead of
+            every route whose bounding box overlaps them
+        clip: Trim the returned geometry to the bounds
+        margin: Fraction of the bounds size kept around them when clipping
+        sort: Order of the routes, id (default) or distance
+        cursor: Token from the X-Next-Cursor header of the previous page. The
+            header is only sent for full pages and not when streaming.
+    """
+    try:
+        response_format = negotiate_format(format, request.headers.get("accept"))
+        sort, after = resolve_page(sort, cursor, ROUTE_SORT_KEYS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     min_distance = min_distance * 1000 if min_distance else None
     max_distance = max_distance * 1000 if max_distance else None
 
-    min_bounds_list = (
-        list(reversed([float(i) for i in min_bounds.split(",")]))
-        if min_bounds
+    min_bounds_list = parse_bounds(min_bounds)
+    max_bounds_list = parse_bounds(max_bounds)
+
+    collections_list = collections.split(",") if collections else None
+
+    has_bounds = min_bounds_list is not None and max_bounds_list is not None
+
+    if tolerance is None and zoom is not None:
+        tolerance = zoom_to_tolerance(zoom)
+
+    clip_bounds = (
+        expand_bounds(min_bounds_list, max_bounds_list, margin)
+        if clip and has_bounds
         else None
     )
-    max_bounds_list = (
-        list(reversed([float(i) for i in max_bounds.split(",")]))
-        if max_bounds
+
+    key = (
+        "routes",
+        response_format,
+        sport,
+        tuple(collections_list or ()),
+        min_distance,
+        max_distance,
+        tuple(min_bounds_list or ()),
+        tuple(max_bounds_list or ()),
+        exact,
+        tolerance,
+        margin if clip_bounds else None,
+        sort,
+        tuple(after or ()),
+        limit,
+    )
+
+    return dict(
+        format=response_format,
+        sport=sport,
+        collections=collections_list,
+        min_distance=min_distance,
+        max_distance=max_distance,
+        min_bounds=min_bounds_list,
+        max_bounds=max_bounds_list,
+        exact=exact and has_bounds,
+        tolerance=tolerance,
+        clip_bounds=clip_bounds,
+        sort=sort,
+        after=after,
+        limit=limit,
+        polygon=None,
+        within=False,
+        key=key,
+    )
+
+
+def get_exact_segment_index(params: dict) -> SegmentIndex | None:
+    """
+    Segment index for the exact viewport filter. While it is rebuilt after
+    an import, requests fall back to the bounding box filter instead of
+    waiting for the build, see start_segment_index_build.
+    """
+    if not params["exact"]:
+        return None
+
+    index = Route.get_current_segment_index()
+    if index is None:
+        start_segment_index_build()
+    return index
+
+
+def get_route_filters(session: Session, params: dict) -> dict:
+    """Route.get_all arguments for the parameters from get_route_params"""
+    if params["polygon"] is not None:
+        index = Route.get_segment_index(session)
+    else:
+        index = get_exact_segment_index(params)
+    return query_route_filters(index, params)
+
+
+async def get_route_filters_async(session: AsyncSession, params: dict) -> dict:
+    """
+    Variant of get_route_filters that awaits the route points of a new
+    segment index, and builds and queries the index in the threadpool
+    """
+    if params["polygon"] is None:
+        index = get_exact_segment_index(params)
+    else:
+        index = Route.get_current_segment_index()
+        if index is None:
+            version = get_data_version()
+            points_by_id = await session.run_sync(Route.get_segment_index_points)
+            index = await run_in_threadpool(
+                Route.build_segment_index, points_by_id, version
+            )
+
+    return await run_in_threadpool(query_route_filters, index, params)
+
+
+def query_route_filters(index: SegmentIndex | None, params: dict) -> dict:
+    """
+    Route.get_all arguments for the parameters, with the ids of the routes in
+    the bounds or polygon taken from the segment index
+    """
+    ids = (
+        index.query(params["min_bounds"], params["max_bounds"])
+        if params["exact"] and index is not None
         else None
     )
+    if params["polygon"] is not None:
+        polygon_ids = index.query_polygon(params["polygon"], params["within"])
+        ids = polygon_ids if ids is None else ids & polygon_ids
+
+    return dict(
+        sport=params["sport"],
+        collections=params["collections"],
+        minDistance=params["min_distance"],
+        maxDistance=params["max_distance"],
+        minBounds=params["min_bounds"],
+        maxBounds=params["max_bounds"],
+        limit=params["limit"],
+        ids=ids,
+        sort=params["sort"],
+        after=params["after"],
+    )
+
+
+def fetch_routes(session: Session, params: dict, filters: dict) -> tuple[list, list]:
+    """
+    Query the routes of a page and their unclipped geometry, as plain rows
+    for JSON and as Route objects for the other formats
+    """
+    if params["format"] == FORMAT_JSON:
+        routes = Route.get_all_public(session, **filters)
+        ids = [route["id"] for route in routes]
+    else:
+        routes = Route.get_all(
+            session, **filters, columns=Route.get_columns(RoutePublic)
+        )
+        ids = [route.id for route in routes]
+
+    return routes, get_route_points(session, ids, params["tolerance"])
 
+
+def render_routes(session: Session, params: dict) -> CachedResponse:
+    filters = get_route_filters(session, params)
+    entry = encode_routes_page(*fetch_routes(session, params, filters), params)
+    entry.cacheable = is_exact(params, filters)
+    return entry
+
+
+def is_exact(params: dict, filters: dict) -> bool:
+    """
+    Whether the routes of filters are filtered as exactly as params asked,
+    rather than on their bounding box while the segment index is rebuilt
+    """
+    return not params["exact"] or filters["ids"] is not None
+
+
+def encode_routes_page(
+    routes: list, route_points: list[list], params: dict
+) -> CachedResponse:
+    """Serialize the routes fetched by fetch_routes, clipping their geometry"""
+    response_format = params["format"]
+    route_points = clip_route_points(route_points, params["clip_bounds"])
+
+    if response_format == FORMAT_JSON:
+        # Fast path: plain rows serialized with orjson, same bytes as RoutePublic
+        for route, points in zip(routes, route_points):
+            route["routePoints"] = points
+
+        content = dump_json(routes)
+        last_key = (
+            [
+                routes[-1][column.key]
+                for column in Route.get_sort_columns(params["sort"])
+            ]
+            if routes
+            else None
+        )
+
+    else:
+        content = encode_routes(routes, route_points, response_format)
+        last_key = routes[-1].get_sort_key(params["sort"]) if routes else None
+
+    # A full page means there may be more routes after the last one
+    headers = {}
+    if routes and len(routes) == params["limit"]:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(params["sort"], last_key)
+
+    return CachedResponse(content, MEDIA_TYPES[response_format], headers)
+
+
+def get_routes(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    params: dict = Depends(get_route_params),
+):
+    """List routes matching the filters, see get_route_params"""
+    if params["format"] == FORMAT_NDJSON:
+        routes = Route.get_all(
+            session,
+            **get_route_filters(session, params),
+            columns=Route.get_columns(RoutePublic),
+            batch_size=STREAM_BATCH_SIZE,
+        )
+        return StreamingResponse(
+            stream_routes(session, routes, params["tolerance"], params["clip_bounds"]),
+            media_type=MEDIA_TYPES[FORMAT_NDJSON],
+        )
+
+    return cached_response(
+        request, params["key"], lambda: render_routes(session, params)
+    )
+
+
+async def get_routes_async(
+    *,
+    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    params: dict = Depends(get_route_params),
+):
+    """
+    Variant of get_routes on the async engine. The queries are shared with
+    get_routes and awaited through session.run_sync, while the segment index
+    and the serialization run in the threadpool, so the event loop is not
+    blocked by anything but waiting on the database.
+    """
+    if params["format"] == FORMAT_NDJSON:
+        filters = await get_route_filters_async(session, params)
+        routes = await Route.get_all_async(
+            session,
+            **filters,
+            columns=Route.get_columns(RoutePublic),
+            batch_size=STREAM_BATCH_SIZE,
+        )
+        return StreamingResponse(
+            stream_routes_async(
+                session, routes, params["tolerance"], params["clip_bounds"]
+            ),
+            media_type=MEDIA_TYPES[FORMAT_NDJSON],
+        )
+
+    async def render():
+        filters = await get_route_filters_async(session, params)
+        routes, route_points = await session.run_sync(fetch_routes, params, filters)
+        entry = await run_in_threadpool(
+            encode_routes_page, routes, route_points, params
+        )
+        entry.cacheable = is_exact(params, filters)
+        return entry
+
+    return await cached_response_async(request, params["key"], render)
+
+
+@app.get("/tiles/{z}/{x}/{y}.mvt")
+def get_tile(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+):
+    """
+    Vector tile with the route geometries clipped to the tile, simplified to
+    the zoom level. Routes carry their name, sport, collection and distance as
+    feature properties.
+    """
+    if not 0 <= z <= 22 or not 0 <= x < 2**z or not 0 <= y < 2**z:
+        raise HTTPException(status_code=404, detail="Tile not found")
+
+    def render():
+        min_bounds, max_bounds = tile_bounds(z, x, y, MVT_BUFFER)
+        routes = Route.get_all(
+            session, minBounds=min_bounds, maxBounds=max_bounds, limit=None
+        )
+
+        layer = TileLayer()
+        points_by_id = Route.get_route_points_by_ids(
+            session, [route.id for route in routes], zoom_to_tolerance(z)
+        )
+        for route in routes:
+            points = points_by_id.get(route.id)
+            if not points:
+                continue
+
+            layer.add_line(
+                clip_line(project(points, z, x, y)),
+                route.get_tile_properties(),
+                id=route.id,
+            )
+
+        return CachedResponse(
+            encode_tile([layer]),
+            MVT_MEDIA_TYPE,
+            {"Cache-Control": "public, max-age=3600"},
+        )
+
+    return cached_response(request, ("tile", z, x, y), render)
+
+
+@app.post("/routes/polygon")
+def get_routes_in_polygon(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    params: dict = Depends(get_route_params),
+    polygon: dict = Body(...),
+    within: bool = False,
+):
+    """
+    List the routes that pass through a GeoJSON Polygon or MultiPolygon, or
+    a Feature with one, sent as request body. Takes the parameters of
+    /routes, see get_route_params.
+
+    Args:
+        within: Only return routes that lie entirely inside the polygon
+    """
+    try:
+        shape = Polygon.from_geojson(polygon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    digest = hashlib.blake2b(dump_json(polygon), digest_size=16).hexdigest()
+    params = {
+        **params,
+        "polygon": shape,
+        "within": within,
+        "key": (*params["key"], "polygon", digest, within),
+    }
+    return get_routes(session=session, request=request, params=params)
+
+
+@app.get("/routes/near")
+def get_routes_near(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    lat: float,
+    lng: float,
+    radius: float = 10,
+    along: bool = False,
+    sport: str = None,
+    collections: str = None,
+    zoom: float = None,
+    tolerance: float = None,
+    limit: int = 100,
+):
+    """
+    Routes starting within a radius of a point, closest first. Every route has
+    its distance to the point in meters as "nearDistance".
+
+    Args:
+        radius: Search radius in kilometers
+        along: Match routes passing within the radius anywhere, instead of
+            only by their start point. Distances are then to the route
+            simplified to about 100 m.
+        zoom: Map zoom level, used to return a simplified route geometry
+        tolerance: Maximum deviation in degrees of the returned geometry,
+            takes precedence over zoom
+    """
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    if radius <= 0:
+        raise HTTPException(status_code=400, detail="Radius must be positive")
+
+    if tolerance is None and zoom is not None:
+        tolerance = zoom_to_tolerance(zoom)
     collections_list = collections.split(",") if collections else None
 
-    routes = Route.get_all(
-        session,
+    def render():
+        nearby = Route.get_nearby_index(session, along).query(lat, lng, radius * 1000)
+        distances = dict(nearby)
+        routes = Route.get_all_public(
+            session,
+            sport=sport,
+            collections=collections_list,
+            ids=list(distances),
+            limit=None,
+        )
+        routes.sort(key=lambda route: distances[route["id"]])
+        routes = routes[:limit]
+
+        route_points = get_route_points(
+            session, [route["id"] for route in routes], tolerance
+        )
+        for route, points in zip(routes, route_points):
+            route["routePoints"] = points
+            route["nearDistance"] = distances[route["id"]]
+
+        return CachedResponse(dump_json(routes), MEDIA_TYPES[FORMAT_JSON])
+
+    key = (
+        "routes-near",
+        lat,
+        lng,
+        radius,
+        along,
         sport,
-        collections_list,
-        min_distance,
-        max_distance,
-        min_bounds_list,
-        max_bounds_list,
+        tuple(collections_list or ()),
+        tolerance,
         limit,
     )
-    return routes
+    return cached_response(request, key, render)
+
+
+@app.get("/heatmap/{z}/{x}/{y}.png")
+def get_heatmap_tile(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+):
+    """
+    Raster tile of the route density, colored by the number of routes that
+    pass through each pixel.
+    """
+    if not 0 <= z <= 22 or not 0 <= x < 2**z or not 0 <= y < 2**z:
+        raise HTTPException(status_code=404, detail="Tile not found")
+
+    def render():
+        return CachedResponse(
+            Route.get_heatmap(session).render(z, x, y),
+            HEATMAP_MEDIA_TYPE,
+            {"Cache-Control": "public, max-age=3600"},
+        )
+
+    return cached_response(request, ("heatmap", z, x, y), render)
+
+
+@app.get("/clusters")
+def get_clusters(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    zoom: int,
+    min_bounds: str = None,
+    max_bounds: str = None,
+):
+    """
+    Clusters of route start points for the zoomed out map, at most one per
+    64 pixel grid cell. Each cluster has the number of routes, the centroid of
+    their start points and a representative route.
+    """
+    min_bounds_list = parse_bounds(min_bounds)
+    max_bounds_list = parse_bounds(max_bounds)
+
+    def render():
+        clusters = Route.get_cluster_index(session).query(
+            zoom, min_bounds_list, max_bounds_list
+        )
+        return CachedResponse(dump_json(clusters), MEDIA_TYPES[FORMAT_JSON])
+
+    key = (
+        "clusters",
+        zoom,
+        tuple(min_bounds_list or ()),
+        tuple(max_bounds_list or ()),
+    )
+    return cached_response(request, key, render)
 
 
 @app.get("/komoot-route/{id}", response_model=KomootRoutePublicWithRoutePoints)
@@ -147,10 +912,96 @@ def get_komoot_route(*, session: Session = Depends(get_session), id: int):
     return route
 
 
-@app.get("/komoot-routes", response_model=list[KomootRoutePublicWithRoutePoints])
-def get_komoot_routes(*, session: Session = Depends(get_session), limit: int = 1000):
-    routes = KomootRoute.get_all(session, limit)
-    return routes
+def get_komoot_routes(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    cursor: str = None,
+    limit: int = 1000,
+):
+    """
+    List Komoot routes ordered by id.
+
+    Args:
+        cursor: Token from the X-Next-Cursor header of the previous page
+    """
+    after_id = get_komoot_after_id(cursor)
+
+    return cached_response(
+        request,
+        ("komoot-routes", after_id, limit),
+        lambda: render_komoot_routes(
+            KomootRoute.get_all(session, limit, after_id), limit
+        ),
+    )
+
+
+async def get_komoot_routes_async(
+    *,
+    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    cursor: str = None,
+    limit: int = 1000,
+):
+    """Variant of get_komoot_routes on the async engine"""
+    after_id = get_komoot_after_id(cursor)
+
+    async def render():
+        routes = await KomootRoute.get_all_async(session, limit, after_id)
+        return await run_in_threadpool(render_komoot_routes, routes, limit)
+
+    return await cached_response_async(
+        request, ("komoot-routes", after_id, limit), render
+    )
+
+
+def get_komoot_after_id(cursor: str | None) -> int | None:
+    try:
+        _, after = resolve_page(None, cursor, {"id": (int,)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return after[0] if after else None
+
+
+def render_komoot_routes(routes: list[KomootRoute], limit: int) -> CachedResponse:
+    headers = {}
+    if routes and len(routes) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor("id", [routes[-1].id])
+
+    content = dump_json(
+        [
+            KomootRoutePublicWithRoutePoints.model_validate(route).model_dump(
+                mode="json", by_alias=True
+            )
+            for route in routes
+        ]
+    )
+    return CachedResponse(content, MEDIA_TYPES[FORMAT_JSON], headers)
+
+
+# The route listings run on the async engine when USE_ASYNC_DATABASE is set
+if USE_ASYNC_DATABASE:
+    app.get("/route/{id}", response_model=RoutePublic)(get_route_async)
+    app.get("/routes", response_model=list[RoutePublic])(get_routes_async)
+    app.get("/komoot-routes", response_model=list[KomootRoutePublicWithRoutePoints])(
+        get_komoot_routes_async
+    )
+else:
+    app.get("/route/{id}", response_model=RoutePublic)(get_route)
+    app.get("/routes", response_model=list[RoutePublic])(get_routes)
+    app.get("/komoot-routes", response_model=list[KomootRoutePublicWithRoutePoints])(
+        get_komoot_routes
+    )
+
+
+@app.get("/metrics/database")
+def get_database_metrics():
+    """Connection pool utilisation and checkout wait times per engine"""
+    metrics = {"sync": get_pool_metrics(engine)}
+    if async_engine is not None:
+        metrics["async"] = get_pool_metrics(async_engine)
+    return metrics
 
 
 @app.get("/import-komoot-routes")
@@ -186,13 +1037,30 @@ def import_komoot_routes(
 def update_gpx(
     *,
     session: Session = Depends(get_session),
+    force: bool = False,
 ):
-    routes = Route.get_all(session, limit=None)
-    for route in routes:
-        route.add_gpx_file(session)
-        route.add_route_points(session)
+    """
+    Reparse the GPX files of the routes whose file changed since the last
+    parse, or of all routes with force.
+
+    The data version is bumped even when no file changed, so the call also
+    drops the cached responses and indexes of all API processes after the
+    route data was changed outside of an import.
+
+    Returns:
+        Counts of the routes per outcome, see Route.update_gpx_files
+    """
+    counts = Route.update_gpx_files(session, force=force)
+
+    if not (counts["updated"] or counts["added"]):
+        # Bumped by update_gpx_files otherwise
+        DataVersion.bump(session)
+
+    Route.get_cluster_index(session)
+    # Routes that changed shape have to be taken out of the heatmap again
+    Route.get_heatmap(session, rebuild=counts["updated"] > 0)
 
-    return "done"
+    return counts
 
 
 # @app.get("/update-komoot-routes")
@@ -2,14 +2,19 @@ import enum
 import json
 import logging
 import os
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Literal, Optional, TypeAlias
+from typing import Dict, Iterable, List, Literal, Optional, TypeAlias
 
 # Import configuration
 from config import (
     DEFAULT_SOURCES,
     DOWNLOAD_DIR,
+    GPX_BATCH_SIZE,
+    GPX_CACHE_DIR,
+    GPX_WORKERS,
+    HEATMAP_PATH,
     ensure_download_dir,
     ensure_gpx_download_dir,
 )
@@ -17,9 +22,23 @@ from dotenv import load_dotenv
 from humps import camelize
 from komPYoot import API, TourOwner, TourStatus, TourType
 from pydantic import computed_field
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy import Index, Integer, any_, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM, insert
+from sqlalchemy.orm import defer, load_only, selectinload
 from sqlmodel import JSON, Column, Field, Relationship, Session, SQLModel, select
-from utils.route import LAT, LNG, get_min_max, get_track_points
+from sqlmodel.ext.asyncio.session import AsyncSession
+from utils.cache import get_data_version, refresh_data_version
+from utils.route import (
+    SIMPLIFY_TOLERANCES,
+    RouteGeometry,
+    select_tolerance,
+    zoom_to_tolerance,
+)
+from utils.clusters import ClusterIndex
+from utils.heatmap import HEATMAP_MAX_ZOOM, Heatmap
+from utils.ingest import GpxParseCache, get_file_state, process_gpx_files
+from utils.nearby import NearbyIndex
+from utils.spatial import SegmentIndex
 
 # Use the shared logging configuration
 try:
@@ -37,6 +56,41 @@ DEFAULT_SOURCES: list[str] = [
     "gijs_bruinsma",
 ]  # TODO: move to database
 
+# In-process segment index over all routes, the data version it was built at
+# and the lock held while it is built
+_segment_index: SegmentIndex | None = None
+_segment_index_version: int | None = None
+_segment_index_lock = threading.Lock()
+
+# Clusters of the route start points and the data version they were built at
+_cluster_index: ClusterIndex | None = None
+_cluster_index_version: int | None = None
+
+# Route heatmap, the data version it is up to date with and the lock held
+# while routes are added to it
+_heatmap: Heatmap | None = None
+_heatmap_version: int | None = None
+_heatmap_lock = threading.Lock()
+
+# Routes rasterized into the heatmap per database read
+HEATMAP_BATCH_SIZE = 500
+
+# Route data of the GPX files by content hash, shared by all imports
+_gpx_parse_cache = GpxParseCache(GPX_CACHE_DIR)
+
+# Radius search indexes of the route start points (False) and of the points
+# along the routes (True), and the data version they were built at
+_nearby_indexes: Dict[bool, NearbyIndex] = {}
+_nearby_indexes_version: int | None = None
+
+# Level of detail of the points along the routes in the radius search index,
+# roughly 100 m
+NEARBY_TOLERANCE = 0.001
+
+# Collection ids by slug, valid for the data version they were resolved at
+_collection_ids: Dict[str, int] = {}
+_collection_ids_version: int | None = None
+
 # Type aliases for better type safety
 KomootUserId: TypeAlias = str
 SportType: TypeAlias = Literal[
@@ -57,6 +111,11 @@ def to_camel(string):
     return camelize(string)
 
 
+def get_box(min_lat, min_lng, max_lat, max_lng):
+    """PostgreSQL box from coordinates, with longitude as x and latitude as y"""
+    return func.box(func.point(min_lng, min_lat), func.point(max_lng, max_lat))
+
+
 def parse_datetime(date_str: str) -> datetime:
     """Parse datetime string to UTC datetime object"""
     dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
@@ -140,6 +199,48 @@ class SportPublic(SQLModel):
     slug: Optional[str] = None
 
 
+class DataVersion(SQLModel, table=True):
+    """
+    Version of the route data, a single row shared by all processes. Every
+    import bumps it, and the API processes poll it to drop their cached
+    responses and indexes (see utils.cache).
+    """
+
+    __tablename__ = "data_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+
+    @staticmethod
+    def get(session: Session) -> int:
+        version = session.exec(
+            select(DataVersion.version).where(DataVersion.id == 1)
+        ).first()
+        return version or 0
+
+    @staticmethod
+    def bump(session: Session) -> int:
+        """
+        Bump the data version, committing the open transaction of the session
+        with it, and adopt the new version in this process.
+        """
+
+        def bump():
+            version = session.execute(
+                insert(DataVersion)
+                .values(id=1, version=1)
+                .on_conflict_do_update(
+                    index_elements=[DataVersion.id],
+                    set_={"version": DataVersion.version + 1},
+                )
+                .returning(DataVersion.version)
+            ).scalar_one()
+            session.commit()
+            return version
+
+        return refresh_data_version(bump)
+
+
 class Collection(SQLModel, table=True):
     __tablename__ = "collections"
 
@@ -156,6 +257,28 @@ class Collection(SQLModel, table=True):
     def __repr__(self):
         return f"Collection(id={self.id}, name={self.name}, slug={self.slug})"
 
+    @staticmethod
+    def get_ids_by_slugs(session: Session, slugs: List[str]) -> List[int]:
+        """
+        Resolve collection slugs to ids, leaving out unknown slugs. Resolved
+        slugs are cached until the data version changes.
+        """
+        global _collection_ids, _collection_ids_version
+        if _collection_ids_version != get_data_version():
+            _collection_ids = {}
+            _collection_ids_version = get_data_version()
+
+        missing = [slug for slug in slugs if slug not in _collection_ids]
+        if missing:
+            for id, slug in session.exec(
+                select(Collection.id, Collection.slug).where(
+                    Collection.slug.in_(missing)
+                )
+            ):
+                _collection_ids[slug] = id
+
+        return [_collection_ids[slug] for slug in slugs if slug in _collection_ids]
+
 
 class CollectionRoute(SQLModel, table=True):
     __tablename__ = "collection_routes"
@@ -227,11 +350,41 @@ class KomootRoute(SQLModel, table=True):
         return session.exec(select(KomootRoute).where(KomootRoute.id == id)).first()
 
     @staticmethod
-    def get_all(session: Session, limit: Optional[int] = 100):
+    def get_all(
+        session: Session, limit: Optional[int] = 100, after: Optional[int] = None
+    ):
+        """
+        List routes ordered by id.
+
+        Args:
+            after: Only return routes with a higher id, for keyset pagination
+        """
+        query = select(KomootRoute).order_by(KomootRoute.id)
+
+        if after is not None:
+            query = query.where(KomootRoute.id > after)
+
         if limit is None:
-            return session.exec(select(KomootRoute)).all()
+            return session.exec(query).all()
+
+        return session.exec(query.limit(limit)).all()
+
+    @staticmethod
+    async def get_all_async(
+        session: AsyncSession,
+        limit: Optional[int] = 100,
+        after: Optional[int] = None,
+    ):
+        """Async variant of get_all"""
+        query = select(KomootRoute).order_by(KomootRoute.id)
 
-        return session.exec(select(KomootRoute).limit(limit)).all()
+        if after is not None:
+            query = query.where(KomootRoute.id > after)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return (await session.exec(query)).all()
 
     @staticmethod
     def import_to_database(
@@ -373,6 +526,8 @@ class KomootRoute(SQLModel, table=True):
         except Exception as e:
             session.rollback()
             logger.error(f"Failed to commit changes: {str(e)}")
+        else:
+            DataVersion.bump(session)
 
         return imported_routes
 
@@ -482,6 +637,7 @@ class KomootRoute(SQLModel, table=True):
         """
         try:
             downloaded_routes = cls.download_from_api(sources)
+            file_hashes = Route.get_file_hashes(session)
 
             total_imported = 0
             for source, routes_data in downloaded_routes.items():
@@ -500,6 +656,15 @@ class KomootRoute(SQLModel, table=True):
                     continue
 
             logger.info(f"Total routes imported: {total_imported}")
+            DataVersion.bump(session)
+            Route.get_cluster_index(session)
+            # Routes whose GPX file changed were reparsed and have to be taken
+            # out of the heatmap again
+            new_hashes = Route.get_file_hashes(session)
+            reparsed = any(
+                new_hashes.get(id, hash) != hash for id, hash in file_hashes.items()
+            )
+            Route.get_heatmap(session, rebuild=reparsed)
         except Exception as e:
             logger.error(f"Error in download and import process: {str(e)}")
             raise
@@ -673,24 +838,68 @@ class Route(SQLModel, table=True):
     name: str = Field(..., min_length=1)
     sport: Sport = Field(sa_column=Column(ENUM(Sport)))
     distance: Optional[float] = Field(None, ge=0)
+    elevation_up: Optional[float] = Field(None, ge=0)
+    elevation_down: Optional[float] = Field(None, ge=0)
     komoot_id: Optional[int] = Field(default=None, foreign_key="komoot_routes.id")
     gpx_file_path: Optional[str] = None
+    gpx_file_size: Optional[int] = None
+    gpx_file_mtime: Optional[float] = None
+    gpx_file_hash: Optional[str] = None
     route_points: Optional[List[List[float]]] = Field(
         sa_column=Column(JSON), default=[]
     )
+    simplified_route_points: Optional[Dict[str, List[List[float]]]] = Field(
+        sa_column=Column(JSON), default={}
+    )
     min_lat: Optional[float] = None
     min_lng: Optional[float] = None
     max_lat: Optional[float] = None
     max_lng: Optional[float] = None
 
     komoot: KomootRoute | None = Relationship(back_populates="routes")
+    # Ordered, so the first collection that decides the GPX file directory
+    # is the same on every load
     collections: list["CollectionRoute"] = Relationship(
-        back_populates="route", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="route",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "order_by": "CollectionRoute.collection_id",
+        },
     )
 
+    @staticmethod
+    def bbox():
+        """Bounding box of the route as a PostgreSQL box, matching ix_routes_bbox"""
+        return get_box(Route.min_lat, Route.min_lng, Route.max_lat, Route.max_lng)
+
+    @staticmethod
+    def get_relationship_options() -> list:
+        """
+        Eager loading of the relationships that RoutePublic and the tile
+        properties read, one query per relationship instead of one per route.
+        """
+        return [
+            selectinload(Route.collections).selectinload(CollectionRoute.collection),
+            selectinload(Route.komoot),
+        ]
+
     @staticmethod
     def get_by_id(session: Session, id: int):
-        return session.exec(select(Route).where(Route.id == id)).first()
+        return session.exec(
+            select(Route)
+            .where(Route.id == id)
+            .options(*Route.get_relationship_options())
+        ).first()
+
+    @staticmethod
+    async def get_by_id_async(session: AsyncSession, id: int):
+        return (
+            await session.exec(
+                select(Route)
+                .where(Route.id == id)
+                .options(*Route.get_relationship_options())
+            )
+        ).first()
 
     @staticmethod
     def get_by_komoot_id(session: Session, komoot_id: int):
@@ -706,8 +915,280 @@ class Route(SQLModel, table=True):
         minBounds: Optional[List[float]] = None,
         maxBounds: Optional[List[float]] = None,
         limit: Optional[int] = 100,
+        ids: Optional[Iterable[int]] = None,
+        columns: Optional[Iterable] = None,
+        batch_size: Optional[int] = None,
+        sort: str = "id",
+        after: Optional[List] = None,
+    ):
+        """
+        List routes matching the filters.
+
+        The geometry columns are deferred unless requested through columns;
+        they are loaded on first access per route, or for many routes at once
+        with get_route_points_by_ids.
+
+        Args:
+            ids: Only return routes with these ids
+            columns: Route columns to load, e.g. Route.get_columns(RoutePublic).
+                Defaults to every column except the geometry.
+            batch_size: Stream the routes from a server-side cursor and return
+                an iterator over lists of at most batch_size routes. It has to
+                be consumed while the session is open.
+            sort: Order of the routes, one of ROUTE_SORT_KEYS. Sorting on
+                distance leaves out routes without a distance.
+            after: Sort key of the last route of the previous page (see
+                get_sort_key), for keyset pagination
+        """
+        collection_ids = (
+            Collection.get_ids_by_slugs(session, collections)
+            if collections is not None
+            else None
+        )
+        query = Route.select_all(
+            sport,
+            collection_ids,
+            minDistance,
+            maxDistance,
+            minBounds,
+            maxBounds,
+            limit,
+            ids,
+            columns,
+            sort,
+            after,
+        )
+
+        if batch_size is not None:
+            return session.exec(
+                query.execution_options(yield_per=batch_size)
+            ).partitions()
+
+        return session.exec(query).all()
+
+    @staticmethod
+    async def get_all_async(
+        session: AsyncSession,
+        sport: Optional[Sport] = None,
+        collections: Optional[List[str]] = None,
+        minDistance: Optional[float] = None,
+        maxDistance: Optional[float] = None,
+        minBounds: Optional[List[float]] = None,
+        maxBounds: Optional[List[float]] = None,
+        limit: Optional[int] = 100,
+        ids: Optional[Iterable[int]] = None,
+        columns: Optional[Iterable] = None,
+        batch_size: Optional[int] = None,
+        sort: str = "id",
+        after: Optional[List] = None,
+    ):
+        """
+        Async variant of get_all. With batch_size it returns an async iterator
+        over lists of routes.
+
+        Deferred columns can't be loaded lazily on an async session, fetch the
+        geometry with get_route_points_by_ids through session.run_sync instead.
+        """
+        collection_ids = (
+            await session.run_sync(Collection.get_ids_by_slugs, collections)
+            if collections is not None
+            else None
+        )
+        query = Route.select_all(
+            sport,
+            collection_ids,
+            minDistance,
+            maxDistance,
+            minBounds,
+            maxBounds,
+            limit,
+            ids,
+            columns,
+            sort,
+            after,
+        )
+
+        if batch_size is not None:
+            result = await session.stream_scalars(
+                query.execution_options(yield_per=batch_size)
+            )
+            return result.partitions()
+
+        return (await session.exec(query)).all()
+
+    @staticmethod
+    def select_all(
+        sport: Optional[Sport] = None,
+        collection_ids: Optional[List[int]] = None,
+        minDistance: Optional[float] = None,
+        maxDistance: Optional[float] = None,
+        minBounds: Optional[List[float]] = None,
+        maxBounds: Optional[List[float]] = None,
+        limit: Optional[int] = 100,
+        ids: Optional[Iterable[int]] = None,
+        columns: Optional[Iterable] = None,
+        sort: str = "id",
+        after: Optional[List] = None,
+    ):
+        """Select of routes for get_all and get_all_async"""
+        query = select(Route).options(*Route.get_relationship_options())
+
+        if columns is not None:
+            query = query.options(load_only(*columns))
+        else:
+            query = query.options(*[defer(column) for column in GEOMETRY_COLUMNS])
+
+        query = Route.filter_query(
+            query,
+            sport,
+            collection_ids,
+            minDistance,
+            maxDistance,
+            minBounds,
+            maxBounds,
+            limit,
+            ids,
+            sort,
+            after,
+        )
+
+        logger.info(f"Query: {query}")
+        logger.info(
+            f"Parameters: sport={sport}, collections={collection_ids}, minDistance={minDistance}, maxDistance={maxDistance}, minBounds={minBounds}, maxBounds={maxBounds}, limit={limit}"
+        )
+
+        return query
+
+    @staticmethod
+    def get_all_public(
+        session: Session,
+        sport: Optional[Sport] = None,
+        collections: Optional[List[str]] = None,
+        minDistance: Optional[float] = None,
+        maxDistance: Optional[float] = None,
+        minBounds: Optional[List[float]] = None,
+        maxBounds: Optional[List[float]] = None,
+        limit: Optional[int] = 100,
+        ids: Optional[Iterable[int]] = None,
+        sort: str = "id",
+        after: Optional[List] = None,
+    ) -> List[dict]:
+        """
+        Fast path of get_all for responses in the RoutePublic shape.
+
+        Reads plain rows instead of ORM objects and builds the camelCase
+        dictionaries directly, skipping model validation. The geometry is left
+        as None under "routePoints" for the caller to fill in, e.g. from
+        get_route_points_by_ids.
+
+        Returns:
+            Dictionaries with the keys and key order of RoutePublic
+        """
+        collection_ids = (
+            Collection.get_ids_by_slugs(session, collections)
+            if collections is not None
+            else None
+        )
+
+        query = Route.filter_query(
+            select(
+                Route.id,
+                Route.name,
+                Route.sport,
+                Route.distance,
+                Route.elevation_up,
+                Route.elevation_down,
+                Route.komoot_id,
+            ),
+            sport,
+            collection_ids,
+            minDistance,
+            maxDistance,
+            minBounds,
+            maxBounds,
+            limit,
+            ids,
+            sort,
+            after,
+        )
+        rows = session.exec(query).all()
+        route_ids = [row.id for row in rows]
+
+        collection_routes: Dict[int, list] = {id: [] for id in route_ids}
+        if route_ids:
+            for id, collection_id, route_id in session.exec(
+                select(
+                    CollectionRoute.id,
+                    CollectionRoute.collection_id,
+                    CollectionRoute.route_id,
+                )
+                .where(CollectionRoute.route_id.in_(route_ids))
+                .order_by(CollectionRoute.collection_id)
+            ):
+                collection_routes[route_id].append(
+                    {"id": id, "collection_id": collection_id, "route_id": route_id}
+                )
+
+        komoot_ids = {row.komoot_id for row in rows if row.komoot_id is not None}
+        komoot_routes = {}
+        if komoot_ids:
+            fields = [
+                (field.alias or name, getattr(KomootRoute, name))
+                for name, field in KomootRoutePublic.model_fields.items()
+            ]
+            for values in session.exec(
+                select(*[column for _, column in fields]).where(
+                    KomootRoute.id.in_(komoot_ids)
+                )
+            ):
+                komoot_routes[values[0]] = {
+                    key: value for (key, _), value in zip(fields, values)
+                }
+
+        routes = []
+        for row in rows:
+            komoot = komoot_routes.get(row.komoot_id)
+            routes.append(
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "sport": row.sport.value if row.sport else None,
+                    "distance": row.distance,
+                    "elevationUp": row.elevation_up,
+                    "elevationDown": row.elevation_down,
+                    "collections": collection_routes[row.id],
+                    "routePoints": None,
+                    "komoot": komoot,
+                    "source": "Komoot" if komoot else "Strava",
+                }
+            )
+
+        return routes
+
+    @staticmethod
+    def filter_query(
+        query,
+        sport: Optional[Sport] = None,
+        collection_ids: Optional[List[int]] = None,
+        minDistance: Optional[float] = None,
+        maxDistance: Optional[float] = None,
+        minBounds: Optional[List[float]] = None,
+        maxBounds: Optional[List[float]] = None,
+        limit: Optional[int] = 100,
+        ids: Optional[Iterable[int]] = None,
+        sort: str = "id",
+        after: Optional[List] = None,
     ):
-        query = select(Route)
+        """
+        Apply the filters, order and limit of get_all to a select on routes,
+        which may select whole routes or only some of their columns.
+
+        Collections are given by id, see Collection.get_ids_by_slugs.
+        """
+        if ids is not None:
+            # One array parameter instead of a placeholder per id, the
+            # segment index can match thousands of routes
+            query = query.where(Route.id == any_(literal(list(ids), ARRAY(Integer))))
 
         if minDistance is not None:
             query = query.where(Route.distance >= minDistance)
@@ -715,32 +1196,314 @@ class Route(SQLModel, table=True):
         if maxDistance is not None:
             query = query.where(Route.distance <= maxDistance)
 
-        if minBounds is not None:
+        if minBounds is not None and maxBounds is not None:
+            # Bounding box overlap, answered by the GiST index on the bbox
+            query = query.where(
+                Route.bbox().op("&&")(
+                    get_box(minBounds[0], minBounds[1], maxBounds[0], maxBounds[1])
+                )
+            )
+
+        elif minBounds is not None:
             query = query.where(Route.max_lat >= minBounds[0])
             query = query.where(Route.max_lng >= minBounds[1])
 
-        if maxBounds is not None:
+        elif maxBounds is not None:
             query = query.where(Route.min_lat <= maxBounds[0])
             query = query.where(Route.min_lng <= maxBounds[1])
 
         if sport is not None:
             query = query.where(Route.sport == sport)
 
-        if collections is not None:
-            query = (
-                query.join(CollectionRoute)
-                .join(Collection)
-                .filter(Collection.slug.in_(collections))
+        if collection_ids is not None:
+            # Semi-join, so routes in several of the collections appear once
+            # and the limit applies to distinct routes
+            query = query.where(
+                select(CollectionRoute.id)
+                .where(
+                    CollectionRoute.route_id == Route.id,
+                    CollectionRoute.collection_id.in_(collection_ids),
+                )
+                .exists()
             )
 
+        sort_columns = Route.get_sort_columns(sort)
+        if sort == "distance":
+            query = query.where(Route.distance.is_not(None))
+
+        if after is not None:
+            if len(after) != len(sort_columns):
+                raise ValueError("Invalid sort key")
+            query = query.where(tuple_(*sort_columns) > tuple_(*after))
+
+        query = query.order_by(*sort_columns)
+
         if limit is not None:
             query = query.limit(limit)
 
-        logger.info(f"Query: {query}")
+        return query
+
+    @staticmethod
+    def get_sort_columns(sort: str) -> tuple:
+        """Columns of a sort order, ending in the id to make the order unique"""
+        if sort == "id":
+            return (Route.id,)
+        if sort == "distance":
+            return (Route.distance, Route.id)
+
+        raise ValueError(f"Unknown sort order: {sort}")
+
+    def get_sort_key(self, sort: str) -> list:
+        """Values of the sort columns of this route, to continue a page after it"""
+        return [getattr(self, column.key) for column in Route.get_sort_columns(sort)]
+
+    @staticmethod
+    def get_columns(model: type[SQLModel]) -> list:
+        """
+        Return the Route columns needed to serialize a response model, leaving
+        out the geometry, which should be fetched with get_route_points_by_ids.
+        """
+        columns = [Route.id]
+        for name in model.model_fields:
+            column = Route.__table__.columns.get(name)
+            if column is not None and name not in ("id", *GEOMETRY_COLUMN_NAMES):
+                columns.append(getattr(Route, name))
+
+        # Foreign keys of the relationships the model serializes
+        if "komoot" in model.model_fields:
+            columns.append(Route.komoot_id)
+
+        return columns
+
+    @staticmethod
+    def get_route_points_by_ids(
+        session: Session,
+        ids: Optional[Iterable[int]] = None,
+        tolerance: Optional[float] = None,
+    ) -> Dict[int, List[List[float]]]:
+        """
+        Fetch the geometry of many routes at once, only reading the level of
+        detail that matches the tolerance.
+
+        Args:
+            ids: Route ids, or None for all routes
+            tolerance: Maximum deviation in degrees, see get_route_points
+
+        Returns:
+            Dictionary mapping route ids to their points
+        """
+        ids = list(ids) if ids is not None else None
+        if ids == []:
+            return {}
+
+        level = select_tolerance(tolerance)
+        column = (
+            Route.route_points
+            if level is None
+            else Route.simplified_route_points[str(level)]
+        )
+        query = select(Route.id, column)
+        if ids is not None:
+            query = query.where(Route.id.in_(ids))
+        points = dict(session.exec(query).all())
+
+        # Routes without simplified levels fall back to their full geometry
+        missing = [id for id, route_points in points.items() if not route_points]
+        if level is not None and missing:
+            points.update(
+                session.exec(
+                    select(Route.id, Route.route_points).where(Route.id.in_(missing))
+                ).all()
+            )
+
+        return points
+
+    @staticmethod
+    def get_segment_index(session: Session) -> SegmentIndex:
+        """
+        Return the segment index of all routes, built from the finest
+        simplified level of detail. It is rebuilt on first use after the data
+        version changed, so routes imported by another process or worker are
+        not left out of the exact viewport filter.
+        """
+        index = Route.get_current_segment_index()
+        if index is None:
+            # One build at a time, later callers use the index it built
+            with _segment_index_lock:
+                index = Route.get_current_segment_index()
+                if index is None:
+                    version = get_data_version()
+                    index = Route.build_segment_index(
+                        Route.get_segment_index_points(session), version
+                    )
+        return index
+
+    @staticmethod
+    def get_current_segment_index() -> SegmentIndex | None:
+        """The segment index if it is up to date with the data version"""
+        if _segment_index_version != get_data_version():
+            return None
+        return _segment_index
+
+    @staticmethod
+    def get_segment_index_points(session: Session) -> Dict[int, list]:
+        """Route points the segment index is built from, by route id"""
+        return Route.get_route_points_by_ids(session, tolerance=SIMPLIFY_TOLERANCES[-1])
+
+    @staticmethod
+    def build_segment_index(
+        points_by_id: Dict[int, list], version: int
+    ) -> SegmentIndex:
+        """
+        Build the segment index from get_segment_index_points and keep it
+        for the data version the points were read at
+        """
+        global _segment_index, _segment_index_version
+        index = SegmentIndex()
+        for id, points in points_by_id.items():
+            if points:
+                index.add(id, points)
+
+        logger.info(f"Built segment index of {len(index)} routes")
+        _segment_index = index
+        _segment_index_version = version
+        return index
+
+    @staticmethod
+    def get_cluster_index(session: Session) -> ClusterIndex:
+        """
+        Return the clusters of the route start points per zoom level. They
+        are rebuilt on first use after the data version changed, so after
+        every import.
+        """
+        global _cluster_index, _cluster_index_version
+        version = get_data_version()
+        if _cluster_index is not None and _cluster_index_version == version:
+            return _cluster_index
+
+        start_points = {}
+        routes = {}
+        for id, name, sport, distance, start_point in session.exec(
+            select(
+                Route.id, Route.name, Route.sport, Route.distance, Route.route_points[0]
+            )
+        ):
+            if not start_point:
+                continue
+            start_points[id] = start_point
+            routes[id] = {
+                "id": id,
+                "name": name,
+                "sport": sport.value if sport else None,
+                "distance": distance,
+            }
+
+        _cluster_index = ClusterIndex(start_points, routes)
+        _cluster_index_version = version
+        logger.info(f"Built clusters of {len(start_points)} route start points")
+        return _cluster_index
+
+    @staticmethod
+    def get_nearby_index(session: Session, along: bool = False) -> NearbyIndex:
+        """
+        Return the radius search index of the route start points, or of the
+        points along the routes. Rebuilt on first use after the data version
+        changed.
+
+        Args:
+            along: Index the points along the routes at NEARBY_TOLERANCE
+                instead of only the start points
+        """
+        global _nearby_indexes_version
+        version = get_data_version()
+        if _nearby_indexes_version != version:
+            _nearby_indexes.clear()
+            _nearby_indexes_version = version
+        if along in _nearby_indexes:
+            return _nearby_indexes[along]
+
+        if along:
+            points_by_id = Route.get_route_points_by_ids(
+                session, tolerance=NEARBY_TOLERANCE
+            )
+        else:
+            points_by_id = dict(
+                session.exec(select(Route.id, Route.route_points[0])).all()
+            )
+            points_by_id = {id: [point] for id, point in points_by_id.items() if point}
+
+        route_ids, points = [], []
+        for id, route_points in points_by_id.items():
+            for point in route_points or []:
+                route_ids.append(id)
+                points.append(point[:2])
+
+        index = NearbyIndex(route_ids, points)
         logger.info(
-            f"Parameters: sport={sport}, collections={collections}, minDistance={minDistance}, maxDistance={maxDistance}, minBounds={minBounds}, maxBounds={maxBounds}, limit={limit}"
+            f"Built radius search index of {len(points)} points of "
+            f"{len(index)} routes"
         )
-        return session.exec(query).all()
+        _nearby_indexes[along] = index
+        return index
+
+    @staticmethod
+    def get_file_hashes(session: Session) -> Dict[int, str | None]:
+        """Content hashes of the GPX files of the routes with route points"""
+        return dict(
+            session.exec(
+                select(Route.id, Route.gpx_file_hash).where(Route.min_lat.is_not(None))
+            ).all()
+        )
+
+    @staticmethod
+    def get_heatmap(session: Session, rebuild: bool = False) -> Heatmap:
+        """
+        Return the route heatmap, up to date with the route data.
+
+        The stored heatmap is loaded on first use and after every import, as
+        the import may have run in another process. Only the routes that are
+        not in it yet are rasterized and the result is stored again. When
+        routes were deleted, or with rebuild, all routes are rasterized again,
+        as the pixels of a route can't be subtracted.
+
+        Args:
+            rebuild: Rasterize all routes, ignoring the stored heatmap
+        """
+        global _heatmap, _heatmap_version
+        with _heatmap_lock:
+            version = get_data_version()
+            if _heatmap is not None and _heatmap_version == version and not rebuild:
+                return _heatmap
+
+            heatmap = None
+            if not rebuild:
+                heatmap = Heatmap.load(HEATMAP_PATH) or _heatmap
+
+            # Routes with route points have a bounding box
+            ids = set(
+                session.exec(select(Route.id).where(Route.min_lat.is_not(None))).all()
+            )
+            if heatmap is None or not heatmap.route_ids <= ids:
+                heatmap = Heatmap()
+
+            new_ids = sorted(ids - heatmap.route_ids)
+            added = 0
+            for start in range(0, len(new_ids), HEATMAP_BATCH_SIZE):
+                added += heatmap.add(
+                    Route.get_route_points_by_ids(
+                        session,
+                        new_ids[start : start + HEATMAP_BATCH_SIZE],
+                        zoom_to_tolerance(HEATMAP_MAX_ZOOM),
+                    )
+                )
+
+            if added or not HEATMAP_PATH.exists():
+                heatmap.save(HEATMAP_PATH)
+                logger.info(f"Added {added} routes to the heatmap of {len(heatmap)}")
+
+            _heatmap = heatmap
+            _heatmap_version = version
+            return heatmap
 
     def add_gpx_file(self, session: Session, commit: bool = True):
         if not self.name:
@@ -753,6 +1516,164 @@ class Route(SQLModel, table=True):
         if commit:
             session.commit()
 
+    def get_gpx_file(self, collection_slug: str) -> Path:
+        """Path of the GPX file of the route in the download directory"""
+        return (
+            ensure_gpx_download_dir(collection_slug, self.sport.value)
+            / self.gpx_file_path
+        )
+
+    @staticmethod
+    def update_gpx_files(
+        session: Session,
+        force: bool = False,
+        workers: int = GPX_WORKERS,
+        batch_size: int = GPX_BATCH_SIZE,
+    ) -> Dict[str, int]:
+        """
+        Reparse the GPX files of all routes and store the route data derived
+        from them.
+
+        The files are read in a pool of worker processes and the results
+        written as they come in, batch_size routes per transaction. Routes
+        whose GPX file has the size and modification time recorded at the
+        last parse are skipped, and so are routes whose file still has the
+        recorded content hash. Files are only parsed when their content is
+        not in the GPX parse cache yet.
+
+        Args:
+            session: SQLAlchemy session
+            force: Rederive the route data of all files, also the unchanged ones
+            workers: Number of worker processes, 1 parses in this process
+            batch_size: Number of routes written per transaction
+
+        Returns:
+            Counts of the routes per outcome: updated (parsed before), added
+            (parsed for the first time), unchanged, missing (no GPX file) and
+            failed, and the hits and misses of the parse cache
+        """
+        routes = session.exec(
+            select(Route).options(
+                load_only(
+                    Route.id,
+                    Route.name,
+                    Route.sport,
+                    Route.gpx_file_path,
+                    Route.gpx_file_size,
+                    Route.gpx_file_mtime,
+                    Route.gpx_file_hash,
+                    Route.distance,
+                    Route.min_lat,
+                ),
+                selectinload(Route.collections).selectinload(
+                    CollectionRoute.collection
+                ),
+            )
+        ).all()
+
+        counts = {
+            "updated": 0,
+            "added": 0,
+            "unchanged": 0,
+            "missing": 0,
+            "failed": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+        }
+        jobs = []
+        parsed_before = set()
+        without_distance = set()
+        file_states = {}
+        for route in routes:
+            if not route.gpx_file_path:
+                route.add_gpx_file(session, commit=False)
+
+            collection = route.collections[0].collection if route.collections else None
+            if not route.gpx_file_path or not route.sport or not collection:
+                counts["missing"] += 1
+                continue
+
+            file = route.get_gpx_file(collection.slug)
+            file_state = get_file_state(file)
+            if file_state is None:
+                counts["missing"] += 1
+                continue
+
+            known_hash = None
+            if route.min_lat is not None:
+                stored_state = (route.gpx_file_size, route.gpx_file_mtime)
+                if not force and file_state == stored_state:
+                    counts["unchanged"] += 1
+                    continue
+                if not force:
+                    known_hash = route.gpx_file_hash
+                parsed_before.add(route.id)
+
+            if route.distance is None:
+                without_distance.add(route.id)
+            file_states[route.id] = file_state
+            jobs.append((route.id, file, known_hash))
+
+        # File paths set above, and let go of the loaded routes
+        session.commit()
+        session.expunge_all()
+        logger.info(
+            f"Reading {len(jobs)} GPX files with {workers} workers, "
+            f"{counts['unchanged']} unchanged, {counts['missing']} missing"
+        )
+
+        done = 0
+        batch = []
+
+        def write_batch():
+            session.bulk_update_mappings(Route, batch)
+            session.commit()
+            batch.clear()
+            logger.info(
+                f"Processed {done}/{len(jobs)} GPX files, "
+                + ", ".join(f"{count} {name}" for name, count in counts.items())
+            )
+
+        results = process_gpx_files(jobs, GPX_CACHE_DIR, workers)
+        for id, result in results:
+            done += 1
+            if result.error is not None:
+                logger.error(f"Error parsing track file of route {id}: {result.error}")
+                counts["failed"] += 1
+                continue
+
+            gpx_file_size, gpx_file_mtime = file_states[id]
+            columns = {
+                "id": id,
+                "gpx_file_size": gpx_file_size,
+                "gpx_file_mtime": gpx_file_mtime,
+                "gpx_file_hash": result.hash,
+            }
+            processed = result.processed
+            if processed is None:
+                # Touched, but the same content
+                batch.append(columns)
+                counts["unchanged"] += 1
+                continue
+
+            counts["cache_hits" if result.cached else "cache_misses"] += 1
+            columns.update(processed.to_columns())
+            if id in without_distance:
+                columns["distance"] = processed.length
+            batch.append(columns)
+            counts["updated" if id in parsed_before else "added"] += 1
+
+            if len(batch) >= batch_size:
+                write_batch()
+
+        write_batch()
+        if counts["updated"] or counts["added"]:
+            DataVersion.bump(session)
+
+        _gpx_parse_cache.hits += counts["cache_hits"]
+        _gpx_parse_cache.misses += counts["cache_misses"]
+        return counts
+
     def add_route_points(
         self, session: Session, collection_slug: str | None = None, commit: bool = True
     ):
@@ -777,29 +1698,43 @@ class Route(SQLModel, table=True):
         Returns:
             self: The updated route object
         """
-        if not self.gpx_file_path or not self.sport or not collection_slug:
-            return self
-
-        # Load route points from GPX file if not already loaded
-        if not self.route_points:
-            activity_type = self.sport
-            file_path = (
-                ensure_gpx_download_dir(collection_slug, activity_type.value)
-                / self.gpx_file_path
-            )
+        # Load route points from GPX file if not loaded yet, or if the file
+        # changed since it was loaded
+        if self.gpx_file_path and self.sport and collection_slug:
+            file = self.get_gpx_file(collection_slug)
+            file_state = get_file_state(file)
+            if file_state is None:
+                if not self.route_points:
+                    logger.warning(f"GPX file not found: {file}")
+                    return self
+            elif not self.route_points or file_state != (
+                self.gpx_file_size,
+                self.gpx_file_mtime,
+            ):
+                result = _gpx_parse_cache.read(
+                    file, self.gpx_file_hash if self.route_points else None
+                )
+                self.gpx_file_size, self.gpx_file_mtime = file_state
+                self.gpx_file_hash = result.hash
+                if result.processed is not None:
+                    columns = result.processed.to_columns()
+                    self.route_points = columns["route_points"]
+                    self.simplified_route_points = columns["simplified_route_points"]
 
-            file = Path(file_path)
-            if not file.exists():
-                logger.warning(f"GPX file not found: {file_path}")
-                return self
+        geometry = self.get_geometry()
 
-            file_string = file.read_text()
-            self.route_points = get_track_points(file_string)
+        if not len(geometry):
+            return self
 
         # Set bounding box
-        if self.route_points:
-            self.min_lat, self.max_lat = get_min_max(self.route_points, LAT)
-            self.min_lng, self.max_lng = get_min_max(self.route_points, LNG)
+        (self.min_lat, self.min_lng), (self.max_lat, self.max_lng) = geometry.bounds()
+        if self.distance is None:
+            self.distance = geometry.length()
+        self.elevation_up, self.elevation_down = geometry.elevation_gain()
+
+        # Precompute the simplified levels of detail
+        if not self.simplified_route_points:
+            self.simplified_route_points = geometry.simplified_levels()
 
         session.add(self)
 
@@ -808,6 +1743,38 @@ class Route(SQLModel, table=True):
 
         return self
 
+    def get_geometry(self) -> RouteGeometry:
+        """Full resolution route points as an array-backed geometry"""
+        return RouteGeometry(self.route_points or ())
+
+    def get_route_points(self, tolerance: Optional[float] = None):
+        """
+        Return the route points simplified to the given tolerance.
+
+        Args:
+            tolerance: Maximum deviation in degrees that is acceptable, e.g. the
+                size of a map pixel. None returns the full resolution.
+
+        Returns:
+            The points of the coarsest precomputed level of detail that is
+            within the tolerance, or the full route points if there is none
+        """
+        level = select_tolerance(tolerance)
+        if level is None or not self.simplified_route_points:
+            return self.route_points
+
+        return self.simplified_route_points.get(str(level), self.route_points)
+
+    def get_tile_properties(self) -> dict:
+        """Properties of the route as a vector tile feature"""
+        collection = self.collections[0].collection if self.collections else None
+        return {
+            "name": self.name,
+            "sport": self.sport.value if self.sport else None,
+            "collection": collection.slug if collection else None,
+            "distance": self.distance,
+        }
+
     def update_from_komoot(self, komoot_route: KomootRoute) -> None:
         """Update route data from Komoot route"""
         self.name = komoot_route.name
@@ -817,11 +1784,43 @@ class Route(SQLModel, table=True):
             self.sport = Sport(komoot_sport_to_slug[komoot_route.sport])
 
 
+Index("ix_routes_bbox", Route.bbox(), postgresql_using="gist")
+Index("ix_routes_distance_id", Route.distance, Route.id)
+Index("ix_routes_sport_id", Route.sport, Route.id)
+Index(
+    "ix_routes_sport_distance_id",
+    Route.sport,
+    Route.distance,
+    Route.id,
+    postgresql_where=Route.distance.is_not(None),
+)
+Index(
+    "ix_routes_komoot_id",
+    Route.komoot_id,
+    postgresql_where=Route.komoot_id.is_not(None),
+)
+Index(
+    "ix_collection_routes_collection_id_route_id",
+    CollectionRoute.collection_id,
+    CollectionRoute.route_id,
+)
+Index("ix_collection_routes_route_id", CollectionRoute.route_id)
+
+# Sort orders of the routes, with the types of their sort key (see
+# Route.get_sort_columns)
+ROUTE_SORT_KEYS = {"id": (int,), "distance": (float, int)}
+
+GEOMETRY_COLUMN_NAMES = ("route_points", "simplified_route_points")
+GEOMETRY_COLUMNS = (Route.route_points, Route.simplified_route_points)
+
+
 class RoutePublic(SQLModel):
     id: int
     name: str
     sport: Optional[Sport] = None
     distance: Optional[float] = None
+    elevation_up: Optional[float] = None
+    elevation_down: Optional[float] = None
     collections: Optional[List[CollectionRoutePublic]] = None
     route_points: Optional[List[List[float]]] = Field(
         None, description="List of [lat, lng] coordinates"
@@ -0,0 +1,85 @@
+"""
+Load benchmark of the route endpoints at increasing concurrency.
+
+Runs against a running API, so start it once with the synchronous engine and
+once with USE_ASYNC_DATABASE=true and compare the throughput:
+
+    uvicorn main:app --port 8000
+    USE_ASYNC_DATABASE=true uvicorn main:app --port 8001
+
+Every listing request asks for a distinct limit, so it misses the response
+cache and reads from the database; /route/1 is only read once. Pass --cached
+to measure cached responses instead.
+
+Usage: python scripts/benchmark_async_load.py [base url] [requests] [--cached]
+"""
+
+import asyncio
+import sys
+import time
+
+import aiohttp
+
+CONCURRENCY = [1, 8, 32, 128]
+PATHS = [
+    "/routes?limit=100",
+    "/routes?limit=100&sort=distance",
+    "/route/1",
+    "/komoot-routes?limit=100",
+]
+
+
+async def run(base_url: str, total: int, concurrency: int, cached: bool):
+    """Send total requests with at most concurrency in flight"""
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        path = PATHS[i % len(PATHS)]
+        if not cached:
+            # Distinct limits miss the response cache but return the same rows
+            path = path.replace("limit=100", f"limit={100 + i}")
+        queue.put_nowait(path)
+
+    async def worker(session):
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            async with session.get(base_url + path) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return (
+        total / elapsed,
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.99)],
+        errors,
+    )
+
+
+async def benchmark(base_url: str, total: int, cached: bool) -> None:
+    print(f"{base_url}, {total} requests per level, cached={cached}")
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for concurrency in CONCURRENCY:
+        throughput, p50, p99, errors = await run(base_url, total, concurrency, cached)
+        print(
+            f"{concurrency:>11} {throughput:>8.1f} {p50 * 1000:>8.1f} "
+            f"{p99 * 1000:>8.1f} {errors:>6}"
+        )
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    base_url = args[0] if args else "http://localhost:8000"
+    total = int(args[1]) if len(args) > 1 else 500
+    asyncio.run(benchmark(base_url.rstrip("/"), total, "--cached" in sys.argv))
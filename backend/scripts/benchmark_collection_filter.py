@@ -0,0 +1,133 @@
+"""
+Benchmark collection filtering as the number of collections per route grows.
+
+For each overlap level every route is put in that many of the collections and
+both the former join filter and the current semi-join filter are timed,
+selecting all collections. The join returns a route once per matching
+collection, so its rows and time grow with the overlap while the semi-join
+returns each route once. Data is seeded into the configured database inside
+a transaction that is rolled back afterwards.
+
+Usage: python scripts/benchmark_collection_filter.py [route count] [repeat]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import engine
+from models.models import Collection, CollectionRoute, Route, Sport
+from sqlalchemy import insert, text
+from sqlmodel import select
+
+COLLECTION_COUNT = 8
+OVERLAPS = [1, 2, 4, 8]
+LIMITS = [100, None]
+
+
+def seed(connection, count: int, overlap: int) -> list[str]:
+    """Insert routes that are each in overlap collections, return the slugs"""
+    rng = random.Random(0)
+    slugs = [f"benchmark-{i}" for i in range(COLLECTION_COUNT)]
+    collection_ids = list(
+        connection.execute(
+            insert(Collection.__table__).returning(Collection.id),
+            [{"name": slug, "slug": slug} for slug in slugs],
+        ).scalars()
+    )
+    route_ids = list(
+        connection.execute(
+            insert(Route.__table__).returning(Route.id),
+            [
+                {
+                    "name": f"Benchmark {i}",
+                    "sport": Sport.gravel_bike,
+                    "distance": rng.uniform(5_000, 200_000),
+                    "route_points": [],
+                    "simplified_route_points": {},
+                }
+                for i in range(count)
+            ],
+        ).scalars()
+    )
+    connection.execute(
+        insert(CollectionRoute.__table__),
+        [
+            {"collection_id": collection_id, "route_id": route_id}
+            for route_id in route_ids
+            for collection_id in rng.sample(collection_ids, overlap)
+        ],
+    )
+    connection.execute(text("ANALYZE routes"))
+    connection.execute(text("ANALYZE collection_routes"))
+    return slugs
+
+
+def join_query(slugs: list[str], limit):
+    """The former filter: join the collections, then limit"""
+    query = (
+        select(Route.id, Route.name)
+        .join(CollectionRoute)
+        .join(Collection)
+        .filter(Collection.slug.in_(slugs))
+        .order_by(Route.id)
+    )
+    return query.limit(limit) if limit is not None else query
+
+
+def semi_join_query(collection_ids: list[int], limit):
+    return Route.filter_query(
+        select(Route.id, Route.name), collection_ids=collection_ids, limit=limit
+    )
+
+
+def measure(connection, query, repeat: int) -> tuple[float, int, int]:
+    """Best time of repeat runs, the number of rows and of distinct routes"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = connection.execute(query).all()
+        best = min(best, time.perf_counter() - start)
+    return best, len(rows), len({row.id for row in rows})
+
+
+def benchmark(count: int = 20_000, repeat: int = 5) -> None:
+    print(f"{count} routes in {COLLECTION_COUNT} collections, selecting all")
+    print(
+        f"{'overlap':>7} {'limit':>6} {'join ms':>8} {'rows':>7} "
+        f"{'semi-join ms':>12} {'rows':>7}"
+    )
+
+    for overlap in OVERLAPS:
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                slugs = seed(connection, count, overlap)
+                collection_ids = list(
+                    connection.execute(
+                        select(Collection.id).where(Collection.slug.in_(slugs))
+                    ).scalars()
+                )
+                for limit in LIMITS:
+                    join_time, join_rows, join_routes = measure(
+                        connection, join_query(slugs, limit), repeat
+                    )
+                    semi_time, semi_rows, _ = measure(
+                        connection, semi_join_query(collection_ids, limit), repeat
+                    )
+                    print(
+                        f"{overlap:>7} {str(limit):>6} {join_time * 1000:>8.1f} "
+                        f"{join_rows:>7} {semi_time * 1000:>12.1f} {semi_rows:>7}"
+                        f"  (join: {join_routes} distinct routes)"
+                    )
+            finally:
+                transaction.rollback()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(count, repeat)
@@ -0,0 +1,80 @@
+"""
+Benchmark the polygon route search as the number of polygon vertices grows.
+
+Builds a segment index of synthetic routes and searches it with wavy
+polygons of increasing detail covering most of the routes, in both modes.
+The polygons are prepared per search, as the endpoint does, so the times
+include building the polygon grid. Runs in memory, no database needed.
+
+Usage: python scripts/benchmark_polygon_search.py [route count] [repeat]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.spatial import Polygon, SegmentIndex
+
+VERTEX_COUNTS = [10, 100, 1_000, 10_000, 50_000]
+POINTS_PER_ROUTE = 500
+CENTER = (52.0, 5.0)
+
+
+def make_index(count: int) -> SegmentIndex:
+    """Random walks of POINTS_PER_ROUTE points of about 10 m around CENTER"""
+    rng = np.random.default_rng(0)
+    index = SegmentIndex()
+    for route_id in range(count):
+        start = np.array(CENTER) + rng.uniform(-0.7, 0.7, 2)
+        steps = rng.normal(0, 0.0001, (POINTS_PER_ROUTE, 2))
+        index.add(route_id, start + steps.cumsum(axis=0))
+    return index
+
+
+def make_ring(vertex_count: int) -> np.ndarray:
+    """Wavy ring around CENTER, like the outline of a region"""
+    angles = np.linspace(0, 2 * np.pi, vertex_count, endpoint=False)
+    radius = 0.5 * (1 + 0.2 * np.sin(7 * angles) + 0.05 * np.sin(61 * angles))
+    return np.column_stack(
+        (CENTER[0] + radius * np.sin(angles), CENTER[1] + radius * np.cos(angles))
+    )
+
+
+def benchmark(count: int = 2_000, repeat: int = 3) -> None:
+    index = make_index(count)
+    print(f"{count} routes of {POINTS_PER_ROUTE} points")
+    print(
+        f"{'vertices':>8} {'build ms':>9} {'through ms':>11} {'routes':>7} "
+        f"{'within ms':>10} {'routes':>7}"
+    )
+
+    for vertex_count in VERTEX_COUNTS:
+        ring = make_ring(vertex_count)
+        build = float("inf")
+        results = {}
+        for within in (False, True):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                polygon = Polygon([ring])
+                built = time.perf_counter()
+                routes = index.query_polygon(polygon, within)
+                best = min(best, time.perf_counter() - start)
+                build = min(build, built - start)
+            results[within] = best, len(routes)
+
+        print(
+            f"{vertex_count:>8} {build * 1000:>9.1f} "
+            f"{results[False][0] * 1000:>11.1f} {results[False][1]:>7} "
+            f"{results[True][0] * 1000:>10.1f} {results[True][1]:>7}"
+        )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    benchmark(count, repeat)
@@ -0,0 +1,80 @@
+"""
+Benchmark the /routes JSON serialization paths against the configured database.
+
+Compares the pydantic path (ORM objects validated into RoutePublic and dumped
+with camelCase aliases) with the fast path (plain rows from
+Route.get_all_public serialized with orjson), and checks that both produce
+the same bytes.
+
+Usage: python scripts/benchmark_serialization.py [limit] [repeat]
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database import engine
+from models.models import Route, RoutePublic
+from pydantic import TypeAdapter
+from sqlmodel import Session
+from utils.encoding import dump_json
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+routes_adapter = TypeAdapter(list[RoutePublic])
+
+
+def serialize_with_pydantic(session: Session, limit: int) -> bytes:
+    routes = Route.get_all(session, limit=limit, columns=Route.get_columns(RoutePublic))
+    points = Route.get_route_points_by_ids(session, [route.id for route in routes])
+    return routes_adapter.dump_json(
+        [
+            RoutePublic.model_validate(
+                route, update={"route_points": points.get(route.id) or []}
+            )
+            for route in routes
+        ],
+        by_alias=True,
+    )
+
+
+def serialize_fast(session: Session, limit: int) -> bytes:
+    routes = Route.get_all_public(session, limit=limit)
+    points = Route.get_route_points_by_ids(session, [route["id"] for route in routes])
+    for route in routes:
+        route["routePoints"] = points.get(route["id"]) or []
+    return dump_json(routes)
+
+
+def measure(function, limit: int, repeat: int) -> tuple[float, bytes]:
+    """Return the best time of repeat runs, each in a fresh session"""
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            content = function(session, limit)
+            best = min(best, time.perf_counter() - start)
+    return best, content
+
+
+def benchmark(limit: int = 1000, repeat: int = 5) -> None:
+    pydantic_time, pydantic_content = measure(serialize_with_pydantic, limit, repeat)
+    fast_time, fast_content = measure(serialize_fast, limit, repeat)
+
+    print(f"Routes: up to {limit}, response size: {len(fast_content)} bytes")
+    print(f"pydantic: {pydantic_time * 1000:.1f} ms")
+    print(f"fast:     {fast_time * 1000:.1f} ms ({pydantic_time / fast_time:.1f}x)")
+    print(f"Identical output: {pydantic_content == fast_content}")
+
+
+if __name__ == "__main__":
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(limit, repeat)
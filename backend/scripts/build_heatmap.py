@@ -0,0 +1,39 @@
+"""
+Rasterize all routes into the route heatmap and store it at HEATMAP_PATH.
+
+The API keeps the stored heatmap up to date after imports by only adding the
+new routes, so this is needed once, or to start over after routes changed.
+Pass --update to only add the routes that are not in the stored heatmap yet.
+
+Usage: python scripts/build_heatmap.py [--update]
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import HEATMAP_PATH
+from database import engine
+from models.models import Route
+from sqlmodel import Session
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    with Session(engine) as session:
+        heatmap = Route.get_heatmap(session, rebuild="--update" not in sys.argv)
+
+    pixels = sum(len(keys) for keys, _ in heatmap.levels)
+    print(
+        f"{len(heatmap)} routes, {pixels} pixels over {len(heatmap.levels)} zoom "
+        f"levels in {time.perf_counter() - start:.1f} s, "
+        f"{HEATMAP_PATH.stat().st_size / 1024:.0f} KiB at {HEATMAP_PATH}"
+    )
@@ -0,0 +1,87 @@
+"""
+Import an archive of track files (GPX, TCX, FIT or GeoJSON) as routes.
+
+Put the files in the download directory of a collection and sport,
+downloads/<collection slug>/<sport>/, then run this script. It adds a route,
+named after the file, for every track file there that has no route yet, and
+parses the new files in a pool of worker processes. The format of every file
+is recognized by its contents.
+
+Usage: python scripts/import_track_files.py <collection slug> <sport>
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import ensure_gpx_download_dir
+from database import engine
+from models.models import Collection, CollectionRoute, Route, Sport
+from sqlmodel import Session, select
+from utils.parsers import get_track_file_extensions
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("collection", help="slug of an existing collection")
+    parser.add_argument("sport", choices=[sport.value for sport in Sport])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    directory = ensure_gpx_download_dir(args.collection, args.sport)
+    extensions = set(get_track_file_extensions())
+    files = sorted(
+        path
+        for path in directory.iterdir()
+        if path.is_file() and path.suffix.lower() in extensions
+    )
+
+    with Session(engine) as session:
+        collection = session.exec(
+            select(Collection).where(Collection.slug == args.collection)
+        ).first()
+        if collection is None:
+            sys.exit(f"Collection not found: {args.collection}")
+
+        existing = set(
+            session.exec(
+                select(Route.gpx_file_path)
+                .join(CollectionRoute)
+                .where(
+                    CollectionRoute.collection_id == collection.id,
+                    Route.sport == Sport(args.sport),
+                )
+            ).all()
+        )
+
+        added = 0
+        for path in files:
+            if path.name in existing:
+                continue
+            route = Route(
+                name=path.stem, sport=Sport(args.sport), gpx_file_path=path.name
+            )
+            session.add(route)
+            session.flush()
+            session.add(CollectionRoute(route_id=route.id, collection_id=collection.id))
+            added += 1
+        session.commit()
+        print(f"Added {added} of {len(files)} track files in {directory}")
+
+        counts = Route.update_gpx_files(session)
+        if counts["updated"] or counts["added"]:
+            Route.get_heatmap(session, rebuild=counts["updated"] > 0)
+
+    print(
+        ", ".join(f"{count} {name}" for name, count in counts.items())
+        + f" in {time.perf_counter() - start:.1f} s"
+    )
@@ -0,0 +1,49 @@
+"""
+Reparse the GPX files of the routes in bulk, in a pool of worker processes.
+
+Only the files that changed since the last parse are parsed, pass --force to
+reparse all of them. The stored heatmap is brought up to date afterwards.
+When routes changed the data version is bumped, so a running API drops its
+cached responses and indexes within DATA_VERSION_POLL_INTERVAL seconds.
+
+Usage: python scripts/update_gpx_files.py [--force] [--workers N]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import GPX_BATCH_SIZE, GPX_WORKERS
+from database import engine
+from models.models import Route
+from sqlmodel import Session
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="reparse all files")
+    parser.add_argument("--workers", type=int, default=GPX_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=GPX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        counts = Route.update_gpx_files(
+            session, force=args.force, workers=args.workers, batch_size=args.batch_size
+        )
+        if counts["updated"] or counts["added"]:
+            Route.get_heatmap(session, rebuild=counts["updated"] > 0)
+
+    print(
+        ", ".join(f"{count} {name}" for name, count in counts.items())
+        + f" in {time.perf_counter() - start:.1f} s"
+    )
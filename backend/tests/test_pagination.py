@@ -0,0 +1,50 @@
+"""
+Cursor handling of the keyset pagination.
+
+Usage: cd backend && python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.pagination import encode_cursor, resolve_page
+
+SORT_KEYS = {"id": (int,), "distance": (float, int)}
+
+
+def test_resolve_page_defaults_to_first_sort_order():
+    assert resolve_page(None, None, SORT_KEYS) == ("id", None)
+
+
+@pytest.mark.parametrize("key", [[12.5, 3], [12, 3]])
+def test_resolve_page_accepts_cursor_of_sort_order(key):
+    cursor = encode_cursor("distance", key)
+    assert resolve_page(None, cursor, SORT_KEYS) == ("distance", key)
+
+
+@pytest.mark.parametrize(
+    "sort, key",
+    [
+        ("id", []),
+        ("id", [1, 2]),
+        ("distance", [12.5]),
+        ("id", ["1"]),
+        ("id", [True]),
+        ("id", [None]),
+        ("distance", [12.5, 3.5]),
+        ("distance", ["12.5", 3]),
+    ],
+)
+def test_resolve_page_rejects_key_not_matching_sort_order(sort, key):
+    with pytest.raises(ValueError):
+        resolve_page(None, encode_cursor(sort, key), SORT_KEYS)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("name", [1])])
+def test_resolve_page_rejects_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        resolve_page(None, cursor, SORT_KEYS)
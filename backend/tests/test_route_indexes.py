@@ -0,0 +1,224 @@
+"""
+Index usage of the route filters.
+
+Seeds a synthetic dataset into the PostgreSQL database in TEST_DATABASE_URL
+inside a transaction, analyzes it, and checks that the plans of the queries
+behind the /routes filters and the Komoot import use the expected index. The
+tables are created at the start and dropped at the end, so point it at a
+scratch database. Skipped when TEST_DATABASE_URL is not set.
+
+Usage: cd backend && python -m pytest tests
+"""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+# The application engine is created on import but never connected, the tests
+# use their own engine on TEST_DATABASE_URL
+os.environ.setdefault("DATABASE_PASSWORD", "unused")
+
+from models.models import Collection, CollectionRoute, Route, Sport
+from sqlalchemy import create_engine, insert, text
+from sqlmodel import SQLModel, select
+
+ROUTE_COUNT = 50_000
+COLLECTION_COUNT = 20
+
+# Share of the seeded routes per sport, skewed like a real collection
+SPORT_WEIGHTS = {
+    Sport.gravel_bike: 50,
+    Sport.race_bike: 25,
+    Sport.mountain_bike: 15,
+    Sport.touring_bike: 7,
+    Sport.hike: 2,
+    Sport.run: 1,
+}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(TEST_DATABASE_URL)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def connection(engine):
+    """Connection with the seeded routes, rolled back at the end"""
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, ROUTE_COUNT)
+            yield connection
+        finally:
+            transaction.rollback()
+
+
+def seed(connection, count: int) -> None:
+    """Insert collections, routes and their collection links"""
+    rng = random.Random(0)
+
+    collection_ids = connection.execute(
+        insert(Collection.__table__).returning(Collection.id),
+        [
+            {"name": f"Explain {i}", "slug": f"explain-{i}"}
+            for i in range(COLLECTION_COUNT)
+        ],
+    ).scalars()
+    collection_ids = list(collection_ids)
+
+    routes = []
+    for i in range(count):
+        lat, lng = rng.uniform(50.5, 53.5), rng.uniform(3.5, 7.0)
+        size = rng.uniform(0.02, 0.3)
+        routes.append(
+            {
+                "name": f"Explain {i}",
+                "sport": rng.choices(
+                    list(SPORT_WEIGHTS), weights=list(SPORT_WEIGHTS.values())
+                )[0],
+                "distance": (
+                    rng.uniform(5_000, 200_000) if rng.random() > 0.05 else None
+                ),
+                "komoot_id": None,
+                "route_points": [],
+                "simplified_route_points": {},
+                "min_lat": lat,
+                "min_lng": lng,
+                "max_lat": lat + size,
+                "max_lng": lng + size,
+            }
+        )
+    route_ids = list(
+        connection.execute(
+            insert(Route.__table__).returning(Route.id), routes
+        ).scalars()
+    )
+
+    # Most routes are in one collection, the first collections are the largest
+    links = []
+    for route_id in route_ids:
+        for collection_id in set(
+            rng.choices(
+                collection_ids,
+                weights=range(COLLECTION_COUNT, 0, -1),
+                k=rng.choice((1, 1, 1, 2)),
+            )
+        ):
+            links.append({"collection_id": collection_id, "route_id": route_id})
+    connection.execute(insert(CollectionRoute.__table__), links)
+
+    connection.execute(text("ANALYZE routes"))
+    connection.execute(text("ANALYZE collection_routes"))
+    connection.execute(text("ANALYZE collections"))
+
+
+def get_plan_indexes(connection, query) -> set:
+    """Names of the indexes used anywhere in the plan of a query"""
+    compiled = query.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    indexes = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+    return indexes
+
+
+def get_ids(connection) -> dict:
+    """Ids of a seeded route and of the largest and smallest collection"""
+    return dict(
+        route=connection.execute(
+            select(Route.id).where(Route.name == "Explain 0")
+        ).scalar(),
+        collection=connection.execute(
+            select(Collection.id).where(Collection.slug == "explain-0")
+        ).scalar(),
+        last_collection=connection.execute(
+            select(Collection.id).where(
+                Collection.slug == f"explain-{COLLECTION_COUNT - 1}"
+            )
+        ).scalar(),
+    )
+
+
+def routes(**filters):
+    return Route.filter_query(select(Route.id, Route.name), **filters)
+
+
+# Queries by the ids of get_ids, each with the indexes of which its plan
+# should use one
+CASES = {
+    "sport": (lambda ids: routes(sport=Sport.run), ("ix_routes_sport_id",)),
+    "sport and distance, by distance": (
+        lambda ids: routes(
+            sport=Sport.hike,
+            minDistance=50_000,
+            maxDistance=60_000,
+            sort="distance",
+        ),
+        ("ix_routes_sport_distance_id",),
+    ),
+    "distance, by distance": (
+        lambda ids: routes(minDistance=50_000, maxDistance=51_000, sort="distance"),
+        ("ix_routes_distance_id",),
+    ),
+    "bounds": (
+        lambda ids: routes(minBounds=[52.0, 5.0], maxBounds=[52.05, 5.05], limit=None),
+        ("ix_routes_bbox",),
+    ),
+    "collections": (
+        lambda ids: routes(collection_ids=[ids["last_collection"]]),
+        ("ix_collection_routes_collection_id_route_id",),
+    ),
+    "collections of routes": (
+        lambda ids: select(CollectionRoute).where(
+            CollectionRoute.route_id.in_([ids["route"], ids["route"] + 1])
+        ),
+        ("ix_collection_routes_route_id",),
+    ),
+    "import: route of a Komoot route": (
+        lambda ids: select(Route).where(Route.komoot_id == 123),
+        ("ix_routes_komoot_id",),
+    ),
+    "import: route in collection": (
+        lambda ids: select(CollectionRoute).where(
+            CollectionRoute.collection_id == ids["collection"],
+            CollectionRoute.route_id == ids["route"],
+        ),
+        (
+            "ix_collection_routes_collection_id_route_id",
+            "ix_collection_routes_route_id",
+        ),
+    ),
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_plan_uses_index(connection, case):
+    make_query, expected = CASES[case]
+    indexes = get_plan_indexes(connection, make_query(get_ids(connection)))
+    assert not indexes.isdisjoint(expected), (
+        f"expected {' or '.join(expected)}, "
+        f"plan uses {', '.join(sorted(indexes)) or 'no index'}"
+    )
@@ -0,0 +1,226 @@
+"""
+In-process cache of serialized responses.
+
+Route data only changes when an import runs, so responses are cached by
+endpoint and normalized parameters together with a global data version. The
+version is stored in the database and bumped by every import, whichever
+process runs it. Every process keeps a copy of it, polled from the database,
+and drops all of its cached responses at once when it changes.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+from utils.compression import (
+    COMPRESSION_MIN_SIZE,
+    PRECOMPRESSED_MEDIA_TYPES,
+    compress,
+)
+
+# Upper bound of the summed size of the cached response bodies
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# Copy of the data version in the database, see refresh_data_version
+_data_version = 0
+_lock = threading.Lock()
+_listeners: List[Callable[[int], None]] = []
+
+
+def get_data_version() -> int:
+    return _data_version
+
+
+def refresh_data_version(load: Callable[[], int]) -> int:
+    """
+    Adopt the data version returned by load, and drop all cached responses
+    when it changed. Loads run one at a time, so a poll that read the
+    database before an import committed its bump can't undo the bump.
+
+    Args:
+        load: Reads the version from the database, or bumps it and returns
+            the bumped version
+    """
+    global _data_version
+    with _lock:
+        version = load()
+        changed = version != _data_version
+        if changed:
+            _data_version = version
+            response_cache.clear()
+
+    if changed:
+        for listener in _listeners:
+            listener(version)
+    return version
+
+
+def add_data_version_listener(listener: Callable[[int], None]) -> None:
+    """
+    Call listener with the new data version every time it changes, after
+    the cached responses were dropped. Listeners run on the thread that
+    refreshed the version, so they should hand slow work to another thread.
+    """
+    _listeners.append(listener)
+
+
+def watch_data_version(load: Callable[[], int], interval: float) -> threading.Event:
+    """
+    Poll the data version every interval seconds in a daemon thread, so
+    imports of other processes are picked up.
+
+    Returns:
+        Event that stops the polling when set
+    """
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(interval):
+            try:
+                refresh_data_version(load)
+            except Exception as e:
+                logger.warning(f"Error reading the data version: {str(e)}")
+
+    threading.Thread(target=watch, name="data-version", daemon=True).start()
+    return stop
+
+
+def make_etag(content: bytes) -> str:
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the ETag, weak or strong"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CachedResponse:
+    """
+    Serialized response body with its media type and extra headers, and the
+    compressed bodies per content encoding once they have been requested.
+    """
+
+    def __init__(self, content: bytes, media_type: str, headers: Dict[str, str] = None):
+        self.content = content
+        self.media_type = media_type
+        self.headers = dict(headers or {})
+        self.etag = make_etag(content)
+        self.encoded: Dict[str, bytes] = {}
+        self.key: Optional[Hashable] = None
+        # Cleared for responses that are only valid until a pending rebuild
+        self.cacheable = True
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(body) for body in self.encoded.values())
+
+    def is_compressible(self) -> bool:
+        return (
+            len(self.content) >= COMPRESSION_MIN_SIZE
+            and self.media_type not in PRECOMPRESSED_MEDIA_TYPES
+        )
+
+    def get_etag(self, encoding: Optional[str] = None) -> str:
+        """ETag of the body in an encoding, which differs per encoding"""
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized responses, bounded by the total body size.
+
+    Keys are prefixed with the data version, so responses of older data are
+    never served even before they are evicted.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        key = (get_data_version(), key)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: Hashable, entry: CachedResponse, version: int) -> None:
+        """
+        Store a response rendered from the data of version. Responses that
+        were rendered while an import bumped the version, or that are not
+        cacheable, are not stored.
+        """
+        if (
+            not entry.cacheable
+            or entry.size > self.max_bytes
+            or version != get_data_version()
+        ):
+            return
+
+        key = (version, key)
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            entry.key = key
+            self.entries[key] = entry
+            self.size += entry.size
+            self._evict()
+
+    def get_body(self, entry: CachedResponse, encoding: Optional[str]) -> bytes:
+        """
+        Return the body of a response in a content encoding. The body is
+        compressed on the first request for the encoding and stored with the
+        response, so later requests reuse it.
+        """
+        if encoding is None:
+            return entry.content
+
+        body = entry.encoded.get(encoding)
+        if body is not None:
+            return body
+
+        body = compress(entry.content, encoding)
+        with self._lock:
+            if encoding not in entry.encoded:
+                entry.encoded[encoding] = body
+                if self.entries.get(entry.key) is entry:
+                    self.size += len(body)
+                    self._evict()
+        return body
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.route import LAT, LNG, TILE_SIZE
+
+# Size in screen pixels of a cluster grid cell
+CLUSTER_CELL_SIZE = 64
+
+# Zoom levels with precomputed clusters, higher zoom levels use the last one
+CLUSTER_MAX_ZOOM = 16
+
+_MAX_LATITUDE = 85.0511287798
+
+
+def project_pixels(points: np.ndarray, zoom: int) -> np.ndarray:
+    """
+    Project [lat, lng] points to Web Mercator pixel coordinates of the whole
+    world at a zoom level.
+
+    Returns:
+        (N, 2) array of [x, y]
+    """
+    scale = TILE_SIZE * 2**zoom
+    lat = np.radians(np.clip(points[:, LAT], -_MAX_LATITUDE, _MAX_LATITUDE))
+    x = (points[:, LNG] + 180) / 360 * scale
+    y = (1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * scale
+    return np.column_stack((x, y))
+
+
+class ClusterLevel:
+    """Grid clusters of one zoom level, stored column-wise"""
+
+    def __init__(self, points: np.ndarray, route_ids: np.ndarray, zoom: int):
+        cells = np.floor(project_pixels(points, zoom) / CLUSTER_CELL_SIZE).astype(
+            np.int64
+        )
+        # One integer per cell, as unique on 1-D keys is much faster
+        keys = (cells[:, 0] << 32) | cells[:, 1]
+        _, inverse = np.unique(keys, return_inverse=True)
+        size = int(inverse.max()) + 1 if len(inverse) else 0
+
+        self.count = np.bincount(inverse, minlength=size)
+        self.lat = np.bincount(inverse, points[:, LAT], size) / self.count
+        self.lng = np.bincount(inverse, points[:, LNG], size) / self.count
+
+        # The representative route starts closest to the cluster centroid
+        distances = np.hypot(
+            points[:, LAT] - self.lat[inverse], points[:, LNG] - self.lng[inverse]
+        )
+        order = np.lexsort((distances, inverse))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = inverse[order][1:] != inverse[order][:-1]
+        self.route_id = np.empty(size, dtype=np.int64)
+        self.route_id[inverse[order][first]] = route_ids[order][first]
+
+    def __len__(self):
+        return len(self.count)
+
+
+class ClusterIndex:
+    """
+    Clusters of route start points for each zoom level up to
+    CLUSTER_MAX_ZOOM.
+
+    Start points are grouped by the cell of a grid of CLUSTER_CELL_SIZE screen
+    pixels they fall into, so a map view holds at most one cluster per cell
+    whatever the number of routes. Every cluster has its route count, the
+    centroid of the start points and the route that starts closest to the
+    centroid.
+    """
+
+    def __init__(self, start_points: Dict[int, List[float]], routes: Dict[int, dict]):
+        """
+        Args:
+            start_points: [latitude, longitude, ...] start point by route id
+            routes: Summary of the routes, returned as representative route
+        """
+        self.routes = routes
+        route_ids = np.fromiter(start_points.keys(), dtype=np.int64)
+        points = np.array(
+            [point[:2] for point in start_points.values()], dtype=np.float64
+        ).reshape(-1, 2)
+
+        self.levels = [
+            ClusterLevel(points, route_ids, zoom)
+            for zoom in range(CLUSTER_MAX_ZOOM + 1)
+        ]
+
+    def __len__(self):
+        return len(self.levels[-1].count) if self.levels else 0
+
+    def query(
+        self,
+        zoom: int,
+        min_bounds: Optional[List[float]] = None,
+        max_bounds: Optional[List[float]] = None,
+    ) -> List[dict]:
+        """
+        Return the clusters of a zoom level with their centroid in the bounds.
+
+        Args:
+            min_bounds: [min_lat, min_lng]
+            max_bounds: [max_lat, max_lng]
+        """
+        level = self.levels[min(max(int(zoom), 0), CLUSTER_MAX_ZOOM)]
+        mask = np.ones(len(level), dtype=bool)
+        if min_bounds is not None:
+            mask &= (level.lat >= min_bounds[LAT]) & (level.lng >= min_bounds[LNG])
+        if max_bounds is not None:
+            mask &= (level.lat <= max_bounds[LAT]) & (level.lng <= max_bounds[LNG])
+
+        return [
+            {
+                "lat": lat,
+                "lng": lng,
+                "count": count,
+                "route": self.routes.get(route_id),
+            }
+            for lat, lng, count, route_id in zip(
+                level.lat[mask].tolist(),
+                level.lng[mask].tolist(),
+                level.count[mask].tolist(),
+                level.route_id[mask].tolist(),
+            )
+        ]
@@ -0,0 +1,83 @@
+"""
+Content-Encoding negotiation and compression of cached response bodies.
+
+gzip is always available, brotli and zstd when the brotli and zstandard
+packages are installed.
+"""
+
+import gzip
+from typing import Callable, Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this are sent as is, compression would hardly gain
+COMPRESSION_MIN_SIZE = 1024
+
+# Media types that are compressed already
+PRECOMPRESSED_MEDIA_TYPES = {"image/png"}
+
+ENCODING_GZIP = "gzip"
+ENCODING_BROTLI = "br"
+ENCODING_ZSTD = "zstd"
+
+# Bodies are compressed once and then cached, so the levels favour size over
+# speed, short of the slowest settings that would stall the first request
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    ENCODING_GZIP: lambda content: gzip.compress(content, compresslevel=6, mtime=0),
+}
+if zstandard is not None:
+    # A ZstdCompressor is not thread-safe, so every call gets its own
+    ENCODERS[ENCODING_ZSTD] = lambda content: zstandard.ZstdCompressor(
+        level=10
+    ).compress(content)
+if brotli is not None:
+    ENCODERS[ENCODING_BROTLI] = lambda content: brotli.compress(content, quality=7)
+
+# Preferred encodings first, when the client accepts several equally
+ENCODING_PREFERENCE = [ENCODING_ZSTD, ENCODING_BROTLI, ENCODING_GZIP]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content encoding from an Accept-Encoding header.
+
+    Returns:
+        One of the supported encodings, or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = entry.strip().split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in ENCODERS:
+            continue
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+
+    return best
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](content)
@@ -0,0 +1,222 @@
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from utils.route import ELE, LAT, LNG
+
+# Supported geometry formats and their media types
+FORMAT_JSON = "json"
+FORMAT_POLYLINE = "polyline"
+FORMAT_BINARY = "binary"
+FORMAT_NDJSON = "ndjson"
+
+MEDIA_TYPES: Dict[str, str] = {
+    FORMAT_JSON: "application/json",
+    FORMAT_POLYLINE: "application/vnd.polyline+json",
+    FORMAT_BINARY: "application/vnd.route-points+octet-stream",
+    FORMAT_NDJSON: "application/x-ndjson",
+}
+
+# Google encoded polyline precision (5 decimals, roughly 1 m)
+POLYLINE_PRECISION = 5
+
+# Fixed point scales of the binary format: microdegrees and decimetres
+COORDINATE_SCALE = 1_000_000
+ELEVATION_SCALE = 10
+
+
+def negotiate_format(format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Pick the response format from an explicit format parameter or the Accept
+    header, honouring its q-values, falling back to JSON.
+
+    Raises:
+        ValueError: If an unknown format is requested explicitly
+    """
+    if format:
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"Unknown format: {format}")
+        return format
+
+    if accept:
+        media_types = {media_type: name for name, media_type in MEDIA_TYPES.items()}
+        best, best_weight = None, 0.0
+        for entry in accept.split(","):
+            media_type, *params = entry.strip().split(";")
+            weight = 1.0
+            for param in params:
+                name, _, value = param.strip().partition("=")
+                if name == "q":
+                    try:
+                        weight = float(value)
+                    except ValueError:
+                        weight = 0.0
+            # The first of equally weighted media types wins, q=0 excludes
+            name = media_types.get(media_type.strip().lower())
+            if name is not None and weight > best_weight:
+                best, best_weight = name, weight
+        if best is not None:
+            return best
+
+    return FORMAT_JSON
+
+
+def dump_json(content) -> bytes:
+    """
+    Serialize plain Python data to JSON with orjson.
+
+    The output matches the JSON that pydantic produces for the same data, as
+    long as floats stay below 1e16 (orjson writes 1e16 where pydantic writes
+    1e+16), which coordinates, distances and elevations do.
+    """
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def _encode_polyline_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def encode_polyline(
+    points: List[Tuple[float, float, float]], precision: int = POLYLINE_PRECISION
+) -> str:
+    """
+    Encode points with the Google encoded polyline algorithm.
+
+    Only latitude and longitude are encoded, elevation is dropped.
+
+    Args:
+        points: List of [latitude, longitude, elevation] points
+        precision: Number of decimals that are kept
+
+    Returns:
+        The encoded polyline
+    """
+    factor = 10**precision
+    chunks = []
+    previous_lat = previous_lng = 0
+
+    for point in points:
+        lat = round(point[LAT] * factor)
+        lng = round(point[LNG] * factor)
+        chunks.append(_encode_polyline_value(lat - previous_lat))
+        chunks.append(_encode_polyline_value(lng - previous_lng))
+        previous_lat, previous_lng = lat, lng
+
+    return "".join(chunks)
+
+
+def decode_polyline(
+    polyline: str, precision: int = POLYLINE_PRECISION
+) -> List[List[float]]:
+    """Decode a Google encoded polyline into a list of [latitude, longitude]"""
+    factor = 10**precision
+    points = []
+    index = lat = lng = 0
+
+    while index < len(polyline):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(polyline[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lat / factor, lng / factor])
+
+    return points
+
+
+def encode_binary_points(points: List[Tuple[float, float, float]]) -> bytes:
+    """
+    Encode points as a point count followed by delta-encoded int32 triples.
+
+    Layout (little endian):
+        uint32 point count
+        int32 latitude, longitude (microdegrees) and elevation (decimetres)
+        per point, each stored as the difference to the previous point
+
+    Args:
+        points: List of [latitude, longitude, elevation] points
+
+    Returns:
+        The encoded points
+    """
+    values = []
+    previous = (0, 0, 0)
+
+    for point in points:
+        current = (
+            round(point[LAT] * COORDINATE_SCALE),
+            round(point[LNG] * COORDINATE_SCALE),
+            round(point[ELE] * ELEVATION_SCALE) if len(point) > ELE else 0,
+        )
+        values.extend(c - p for c, p in zip(current, previous))
+        previous = current
+
+    return struct.pack(f"<I{len(values)}i", len(points), *values)
+
+
+def decode_binary_points(data: bytes, offset: int = 0) -> Tuple[List[List[float]], int]:
+    """
+    Decode points written by encode_binary_points.
+
+    Returns:
+        The points and the offset directly after them
+    """
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    values = struct.unpack_from(f"<{count * 3}i", data, offset)
+    offset += count * 3 * 4
+
+    points = []
+    lat = lng = ele = 0
+    for i in range(0, len(values), 3):
+        lat += values[i]
+        lng += values[i + 1]
+        ele += values[i + 2]
+        points.append(
+            [lat / COORDINATE_SCALE, lng / COORDINATE_SCALE, ele / ELEVATION_SCALE]
+        )
+
+    return points, offset
+
+
+def encode_binary_record(metadata: bytes, points: List[Tuple[float, float, float]]):
+    """
+    Encode one route as a length-prefixed record.
+
+    Layout (little endian):
+        uint32 metadata length
+        metadata (UTF-8 JSON without the route points)
+        points as written by encode_binary_points
+    """
+    return struct.pack("<I", len(metadata)) + metadata + encode_binary_points(points)
+
+
+def decode_binary_records(data: bytes) -> List[Tuple[bytes, List[List[float]]]]:
+    """Decode a sequence of records written by encode_binary_record"""
+    records = []
+    offset = 0
+
+    while offset < len(data):
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        metadata = data[offset : offset + length]
+        offset += length
+        points, offset = decode_binary_points(data, offset)
+        records.append((metadata, points))
+
+    return records
@@ -0,0 +1,230 @@
+"""
+Streaming FIT (Garmin Flexible and Interoperable Data Transfer) parser.
+
+Decodes the binary messages of a FIT file one at a time and keeps only the
+position, altitude and timestamp of the record messages, so memory stays
+flat however long the recording is. Only the parts of the protocol needed for
+that are implemented; the CRCs are not checked.
+"""
+
+import io
+import math
+import struct
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from utils.tracks import Track, TrackBuilder, TrackSource, open_source
+
+FIT_SIGNATURE = b".FIT"
+
+# Global message number of the record message, and the field numbers read
+_RECORD = 20
+_POSITION_LAT = 0
+_POSITION_LONG = 1
+_ALTITUDE = 2
+_ENHANCED_ALTITUDE = 78
+_TIMESTAMP = 253
+_RECORD_FIELDS = (_POSITION_LAT, _POSITION_LONG, _ALTITUDE, _ENHANCED_ALTITUDE)
+
+# struct format and invalid value of the base types of the fields read, by
+# base type number (the low 5 bits of the base type)
+_BASE_TYPES: Dict[int, Tuple[str, int]] = {
+    0x04: ("H", 0xFFFF),  # uint16
+    0x05: ("i", 0x7FFFFFFF),  # sint32
+    0x06: ("I", 0xFFFFFFFF),  # uint32
+}
+
+# Semicircles (2^31 per 180 degrees) to degrees
+_SEMICIRCLES = 180 / 2**31
+
+# Altitudes are stored as (meters + 500) * 5
+_ALTITUDE_SCALE = 5
+_ALTITUDE_OFFSET = 500
+
+# FIT timestamps count seconds from 1989-12-31 00:00 UTC
+_FIT_EPOCH = 631065600
+
+# Record header bits
+_COMPRESSED_TIMESTAMP = 0x80
+_DEFINITION = 0x40
+_DEVELOPER_DATA = 0x20
+
+
+class FitError(ValueError):
+    """The file is not a FIT file, or it is truncated"""
+
+
+def is_fit(head: bytes) -> bool:
+    """Whether the first bytes of a file are a FIT file header"""
+    return len(head) >= 12 and head[0] in (12, 14) and head[8:12] == FIT_SIGNATURE
+
+
+class _Definition:
+    """
+    Layout of the data messages of a local message type: a struct that
+    unpacks a whole message, and the index in the unpacked values and the
+    invalid value of every field read.
+    """
+
+    def __init__(
+        self,
+        global_number: int,
+        big_endian: bool,
+        fields: List[Tuple[int, int, int]],
+        developer_size: int,
+    ):
+        self.is_record = global_number == _RECORD
+        self.fields: Dict[int, Tuple[int, int]] = {}
+
+        wanted = (_TIMESTAMP, *_RECORD_FIELDS) if self.is_record else (_TIMESTAMP,)
+        formats = []
+        for number, size, base_type in fields:
+            code, invalid = _BASE_TYPES.get(base_type & 0x1F, ("", 0))
+            if number in wanted and code and size == struct.calcsize(code):
+                self.fields[number] = (len(self.fields), invalid)
+                formats.append(code)
+            else:
+                formats.append(f"{size}x")
+        formats.append(f"{developer_size}x")
+
+        self.struct = struct.Struct((">" if big_endian else "<") + "".join(formats))
+
+    def read(self, data: bytes) -> Dict[int, Optional[int]]:
+        """Values of the fields read, None where invalid"""
+        values = self.struct.unpack(data)
+        return {
+            number: None if values[index] == invalid else values[index]
+            for number, (index, invalid) in self.fields.items()
+        }
+
+
+class _Reader:
+    """Reads a file and counts the bytes read"""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.position = 0
+
+    def read(self, size: int) -> bytes:
+        data = self.file.read(size)
+        if len(data) != size:
+            raise FitError("Truncated FIT file")
+        self.position += size
+        return data
+
+    def at_end(self) -> bool:
+        if not self.file.read(1):
+            return True
+        self.file.seek(-1, io.SEEK_CUR)
+        return False
+
+
+def _read_definition(reader: _Reader, header: int) -> _Definition:
+    _, architecture, global_number, field_count = struct.unpack(
+        "<BB2sB", reader.read(5)
+    )
+    big_endian = architecture == 1
+    global_number = int.from_bytes(global_number, "big" if big_endian else "little")
+    # (field number, size, base type) of every field
+    fields = [tuple(reader.read(3)) for _ in range(field_count)]
+
+    developer_size = 0
+    if header & _DEVELOPER_DATA:
+        (developer_count,) = reader.read(1)
+        developer_size = sum(reader.read(3)[1] for _ in range(developer_count))
+
+    return _Definition(global_number, big_endian, fields, developer_size)
+
+
+def _get_altitude(values: Dict[int, Optional[int]]) -> float:
+    altitude = values.get(_ENHANCED_ALTITUDE)
+    if altitude is None:
+        altitude = values.get(_ALTITUDE)
+    if altitude is None:
+        return 0.0
+    return altitude / _ALTITUDE_SCALE - _ALTITUDE_OFFSET
+
+
+def _parse_file(reader: _Reader, builder: TrackBuilder) -> None:
+    """Parse the messages of one FIT file of a possibly chained file"""
+    header = reader.read(1)
+    if header[0] not in (12, 14):
+        raise FitError("Not a FIT file")
+    header += reader.read(header[0] - 1)
+    if not is_fit(header):
+        raise FitError("Not a FIT file")
+    (data_size,) = struct.unpack("<I", header[4:8])
+    end = reader.position + data_size
+
+    definitions: Dict[int, _Definition] = {}
+    timestamp = None
+    while reader.position < end:
+        (record_header,) = reader.read(1)
+
+        if record_header & _COMPRESSED_TIMESTAMP:
+            local_type = (record_header >> 5) & 0x03
+            offset = record_header & 0x1F
+            if timestamp is not None:
+                # The offset is relative to the last full timestamp, rolling
+                # over every 32 seconds
+                rollover = 0x20 if offset < (timestamp & 0x1F) else 0
+                timestamp = (timestamp & ~0x1F) + offset + rollover
+            message_timestamp = timestamp
+        elif record_header & _DEFINITION:
+            definitions[record_header & 0x0F] = _read_definition(reader, record_header)
+            continue
+        else:
+            local_type = record_header & 0x0F
+            message_timestamp = None
+
+        definition = definitions.get(local_type)
+        if definition is None:
+            raise FitError(f"Data message of undefined local type {local_type}")
+
+        values = definition.read(reader.read(definition.struct.size))
+        if values.get(_TIMESTAMP) is not None:
+            timestamp = message_timestamp = values[_TIMESTAMP]
+
+        if not definition.is_record:
+            continue
+        lat = values.get(_POSITION_LAT)
+        lng = values.get(_POSITION_LONG)
+        if lat is None or lng is None:
+            # Indoor recording or no GPS fix yet
+            continue
+
+        builder.append(
+            lat * _SEMICIRCLES,
+            lng * _SEMICIRCLES,
+            _get_altitude(values),
+            math.nan if message_timestamp is None else message_timestamp + _FIT_EPOCH,
+        )
+
+    # File CRC
+    reader.read(2)
+
+
+def parse_fit_track(source: TrackSource) -> Track:
+    """
+    Parse the positions of the record messages of a FIT file. Records
+    without a position, e.g. of an indoor activity or before the GPS had a
+    fix, are left out.
+
+    Args:
+        source: FIT file contents as bytes, or the path of a FIT file
+
+    Returns:
+        The track, elevation 0 and time NaN where a point has none
+
+    Raises:
+        FitError: If the file is not a FIT file or is truncated
+    """
+    builder = TrackBuilder()
+    with open_source(source) as file:
+        reader = _Reader(file)
+        _parse_file(reader, builder)
+
+        # Chained FIT files follow each other in one file
+        while not reader.at_end():
+            _parse_file(reader, builder)
+
+    return builder.build()
@@ -0,0 +1,125 @@
+"""
+GeoJSON track parser.
+
+Reads the positions of the LineString and MultiLineString geometries of a
+GeoJSON file, which may be a bare geometry, a Feature or a FeatureCollection.
+With the ijson package installed the file is streamed, so memory stays flat
+however long the track is; without it the file is loaded with json. GeoJSON
+has no standard for point times, so the times are NaN.
+"""
+
+import json
+from typing import Any, Iterable, Tuple
+
+from utils.tracks import Track, TrackBuilder, TrackSource, open_source
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Geometry types whose positions make up the track
+LINE_TYPES = {"LineString", "MultiLineString"}
+
+
+def is_geojson(head: bytes) -> bool:
+    """Whether the first bytes of a file look like a JSON object"""
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"{")
+
+
+def _append_position(builder: TrackBuilder, position: list) -> None:
+    # GeoJSON positions are [longitude, latitude(, elevation)]
+    if len(position) >= 2:
+        builder.append(
+            float(position[1]),
+            float(position[0]),
+            float(position[2]) if len(position) > 2 else 0.0,
+        )
+
+
+def _stream_positions(
+    events: Iterable[Tuple[str, str, Any]], builder: TrackBuilder
+) -> None:
+    """Add the line positions of the ijson parse events to the builder"""
+    # Per open object: points in the builder at its start, its type and
+    # whether it has coordinates. Positions of geometries that turn out not
+    # to be lines are dropped again when the object ends, as the type may
+    # come after the coordinates.
+    objects = []
+    key = None
+    depth = 0
+    position = []
+
+    for _, event, value in events:
+        if depth:
+            if event == "number":
+                position.append(value)
+            elif event == "start_array":
+                depth += 1
+                position = []
+            elif event == "end_array":
+                depth -= 1
+                _append_position(builder, position)
+                position = []
+        elif event == "map_key":
+            key = value
+            if key == "coordinates" and objects:
+                objects[-1][2] = True
+        elif event == "start_array" and key == "coordinates":
+            depth = 1
+            position = []
+        elif event == "string" and key == "type" and objects:
+            objects[-1][1] = value
+        elif event == "start_map":
+            objects.append([len(builder), None, False])
+            key = None
+        elif event == "end_map":
+            start, object_type, has_coordinates = objects.pop()
+            if has_coordinates and object_type not in LINE_TYPES:
+                builder.truncate(start)
+            key = None
+
+
+def _add_positions(value: Any, builder: TrackBuilder) -> None:
+    """Add the line positions of a loaded GeoJSON object to the builder"""
+    if isinstance(value, dict):
+        if value.get("type") in LINE_TYPES:
+            coordinates = value.get("coordinates") or []
+            if value["type"] == "LineString":
+                coordinates = [coordinates]
+            for line in coordinates:
+                for position in line:
+                    _append_position(builder, position)
+        for key, item in value.items():
+            if key != "coordinates":
+                _add_positions(item, builder)
+    elif isinstance(value, list):
+        for item in value:
+            _add_positions(item, builder)
+
+
+def parse_geojson_track(source: TrackSource) -> Track:
+    """
+    Parse the positions of the lines in a GeoJSON file, in the order they
+    appear.
+
+    Args:
+        source: GeoJSON file contents as bytes, or the path of a GeoJSON file
+
+    Returns:
+        The track, elevation 0 where a position has none, times NaN
+
+    Raises:
+        ValueError: If the file is not valid JSON
+    """
+    builder = TrackBuilder()
+    with open_source(source) as file:
+        if ijson is None:
+            _add_positions(json.load(file), builder)
+        else:
+            try:
+                _stream_positions(ijson.parse(file, use_float=True), builder)
+            except ijson.JSONError as e:
+                raise ValueError(f"Invalid GeoJSON: {e}") from e
+
+    return builder.build()
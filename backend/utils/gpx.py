@@ -0,0 +1,120 @@
+"""
+Streaming GPX parser.
+
+Reads the track points of a GPX file incrementally with iterparse, clearing
+every point once it is read, so memory stays flat however long the recording
+is. The points go straight into float64 arrays preallocated from the file
+size instead of Python lists.
+"""
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from utils.tracks import (
+    Track,
+    TrackBuilder,
+    TrackSource,
+    get_source_size,
+    open_source,
+    parse_time,
+)
+
+GpxSource = TrackSource
+
+# Size of a track point with elevation and time in a GPX file, rounded down
+# so the preallocated arrays rarely have to grow
+GPX_BYTES_PER_POINT = 80
+
+# Local names of the elements the parser acts on
+_TRACK_SEGMENT = "trkseg"
+_TRACK_POINT = "trkpt"
+_ELEVATION = "ele"
+_TIME = "time"
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def parse_gpx_track(source: GpxSource) -> Track:
+    """
+    Parse the track points of a GPX file.
+
+    Args:
+        source: GPX file contents as bytes, or the path of a GPX file
+
+    Returns:
+        The track, elevation 0 and time NaN where a point has none
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the file is not well-formed XML
+    """
+    builder = TrackBuilder(get_source_size(source) // GPX_BYTES_PER_POINT)
+
+    # Namespaced tags map to their local name, computed once per tag
+    names = {}
+    segment = None
+    point = None
+    elevation = None
+    time = None
+
+    with open_source(source) as file:
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            tag = element.tag
+            name = names.get(tag)
+            if name is None:
+                name = names[tag] = _local_name(tag)
+
+            if event == "start":
+                if name == _TRACK_POINT:
+                    point = element
+                    elevation = None
+                    time = None
+                elif name == _TRACK_SEGMENT:
+                    # Read points are removed from their segment as we go
+                    segment = element
+                continue
+
+            if name == _ELEVATION:
+                if point is not None and elevation is None:
+                    elevation = element.text
+            elif name == _TIME:
+                if point is not None and time is None:
+                    time = element.text
+            elif name == _TRACK_POINT:
+                try:
+                    ele = float(elevation) if elevation else 0.0
+                except ValueError:
+                    # A malformed elevation is treated as missing
+                    ele = 0.0
+                builder.append(
+                    float(element.get("lat", "0")),
+                    float(element.get("lon", "0")),
+                    ele,
+                    parse_time(time),
+                )
+
+                point = None
+                element.clear()
+                if segment is not None:
+                    segment.clear()
+
+    return builder.build()
+
+
+def parse_gpx(source: GpxSource) -> np.ndarray:
+    """
+    Parse the track points of a GPX file.
+
+    Args:
+        source: GPX file contents as bytes, or the path of a GPX file
+
+    Returns:
+        (N, 3) float64 array of [latitude, longitude, elevation] points,
+        elevation 0 where the point has none
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the file is not well-formed XML
+    """
+    return parse_gpx_track(source).points
@@ -0,0 +1,264 @@
+"""
+Route density heatmap, rendered as PNG raster tiles.
+
+Every route is rasterized once at HEATMAP_MAX_ZOOM: its points are projected
+to Web Mercator pixels and the segments between them are filled in, so a
+route counts once for every pixel it passes through. Lower zoom levels are
+derived from the same pixels by dividing their coordinates by two per level.
+
+The counts are kept sparse: per zoom level a sorted array of pixel keys and
+an array of counts. Keys are ordered by tile and then by the pixel within the
+tile, so the pixels of a tile are one contiguous slice. Adding routes merges
+their pixels into the arrays without rasterizing the others again.
+"""
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.clusters import project_pixels
+from utils.route import TILE_SIZE
+
+HEATMAP_MEDIA_TYPE = "image/png"
+
+# Zoom level the routes are rasterized at, tiles of higher zoom levels are
+# enlarged from it. One pixel is about 20 m in the Netherlands.
+HEATMAP_MAX_ZOOM = 12
+
+# Color of the lowest and the highest route count, from transparent blue over
+# red and yellow to white, as (position, r, g, b, a)
+HEATMAP_COLORS = [
+    (0.0, 0, 64, 255, 96),
+    (0.35, 255, 0, 0, 192),
+    (0.7, 255, 220, 0, 230),
+    (1.0, 255, 255, 255, 255),
+]
+
+_PIXEL_BITS = 8
+_PIXEL_MASK = (1 << _PIXEL_BITS) - 1
+_TILE_PIXELS = TILE_SIZE * TILE_SIZE
+
+
+def _colormap() -> np.ndarray:
+    """Lookup table of 256 RGBA colors along HEATMAP_COLORS"""
+    positions = [color[0] for color in HEATMAP_COLORS]
+    steps = np.linspace(0, 1, 256)
+    return np.column_stack(
+        [
+            np.interp(steps, positions, [color[channel] for color in HEATMAP_COLORS])
+            for channel in range(1, 5)
+        ]
+    ).astype(np.uint8)
+
+
+_COLORMAP = _colormap()
+
+
+def rasterize(points: List[List[float]], zoom: int) -> np.ndarray:
+    """
+    Return the world pixels a track passes through at a zoom level, pixels
+    may repeat.
+
+    Args:
+        points: [latitude, longitude, ...] points
+
+    Returns:
+        (N, 2) array of integer [x, y] pixel coordinates
+    """
+    coords = np.asarray([point[:2] for point in points], dtype=np.float64)
+    pixels = project_pixels(coords.reshape(-1, 2), zoom)
+    if len(pixels) > 1:
+        # Interpolate every segment in steps of at most one pixel
+        deltas = np.diff(pixels, axis=0)
+        steps = np.maximum(np.ceil(np.abs(deltas).max(axis=1)), 1).astype(np.int64)
+        segments = np.repeat(np.arange(len(deltas)), steps)
+        offsets = np.arange(len(segments)) - np.repeat(np.cumsum(steps) - steps, steps)
+        fractions = (offsets / steps[segments])[:, None]
+        pixels = np.vstack(
+            (pixels[segments] + fractions * deltas[segments], pixels[-1:])
+        )
+
+    world_size = TILE_SIZE * 2**zoom
+    return np.clip(np.floor(pixels), 0, world_size - 1).astype(np.int64)
+
+
+def pixel_keys(pixels: np.ndarray, zoom: int) -> np.ndarray:
+    """Sort keys of world pixels, grouping the pixels of a tile together"""
+    x, y = pixels[:, 0], pixels[:, 1]
+    tiles = ((x >> _PIXEL_BITS) << zoom) | (y >> _PIXEL_BITS)
+    return (
+        (tiles << (2 * _PIXEL_BITS))
+        | ((y & _PIXEL_MASK) << _PIXEL_BITS)
+        | (x & _PIXEL_MASK)
+    )
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an (height, width, 4) uint8 array as an RGBA PNG"""
+    height, width = rgba.shape[:2]
+    # Every row starts with its filter type, 0 for none
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, -1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+class Heatmap:
+    """
+    Number of routes passing through each pixel, for every zoom level up to
+    max_zoom.
+    """
+
+    def __init__(self, max_zoom: int = HEATMAP_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.route_ids: set[int] = set()
+        # Sorted pixel keys and their counts per zoom level, replaced as a
+        # pair so tiles can be read while routes are added
+        self.levels = [
+            (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32))
+            for _ in range(max_zoom + 1)
+        ]
+
+    def __len__(self):
+        return len(self.route_ids)
+
+    def add(self, routes: Dict[int, List[List[float]]]) -> int:
+        """
+        Add the routes that are not in the heatmap yet.
+
+        Args:
+            routes: Points by route id
+
+        Returns:
+            The number of routes added
+        """
+        keys: List[List[np.ndarray]] = [[] for _ in range(self.max_zoom + 1)]
+        added = 0
+        for route_id, points in routes.items():
+            if route_id in self.route_ids or not points:
+                continue
+
+            pixels = rasterize(points, self.max_zoom)
+            for zoom in range(self.max_zoom, -1, -1):
+                # A route counts once per pixel, however often it passes
+                level_keys, first = np.unique(
+                    pixel_keys(pixels, zoom), return_index=True
+                )
+                keys[zoom].append(level_keys)
+                pixels = pixels[first] >> 1
+
+            self.route_ids.add(route_id)
+            added += 1
+
+        if added:
+            for zoom in range(self.max_zoom + 1):
+                self._merge(zoom, np.concatenate(keys[zoom]))
+        return added
+
+    def _merge(self, zoom: int, keys: np.ndarray) -> None:
+        """Add one to the count of every key, keys may repeat"""
+        level_keys, level_counts = self.levels[zoom]
+        merged, inverse = np.unique(
+            np.concatenate((level_keys, keys)), return_inverse=True
+        )
+        weights = np.concatenate((level_counts, np.ones(len(keys), dtype=np.uint32)))
+        counts = np.bincount(inverse, weights, len(merged)).astype(np.uint32)
+        self.levels[zoom] = (merged, counts)
+
+    def get_counts(self, z: int, x: int, y: int) -> np.ndarray:
+        """
+        Return the route counts of a tile as a (TILE_SIZE, TILE_SIZE) array.
+        Tiles beyond max_zoom are enlarged from their ancestor at max_zoom.
+        """
+        shift = max(z - self.max_zoom, 0)
+        zoom = z - shift
+        tile_x, tile_y = x >> shift, y >> shift
+
+        keys, level_counts = self.levels[zoom]
+        start = ((tile_x << zoom) | tile_y) << (2 * _PIXEL_BITS)
+        low, high = np.searchsorted(keys, [start, start + _TILE_PIXELS])
+        counts = np.zeros(_TILE_PIXELS, dtype=np.uint32)
+        counts[keys[low:high] & (_TILE_PIXELS - 1)] = level_counts[low:high]
+        counts = counts.reshape(TILE_SIZE, TILE_SIZE)
+
+        if shift:
+            size = max(TILE_SIZE >> shift, 1)
+            left = (x & ((1 << shift) - 1)) * TILE_SIZE >> shift
+            top = (y & ((1 << shift) - 1)) * TILE_SIZE >> shift
+            block = counts[top : top + size, left : left + size]
+            scale = TILE_SIZE // size
+            counts = np.repeat(np.repeat(block, scale, axis=0), scale, axis=1)
+
+        return counts
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        """
+        Render a tile as PNG. Colors follow the logarithm of the route count,
+        relative to the highest count of the zoom level.
+        """
+        counts = self.get_counts(z, x, y)
+        _, level_counts = self.levels[min(z, self.max_zoom)]
+        maximum = int(level_counts.max()) if len(level_counts) else 0
+
+        rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+        mask = counts > 0
+        if maximum:
+            intensity = np.log1p(counts[mask]) / np.log1p(maximum)
+            rgba[mask] = _COLORMAP[np.round(intensity * 255).astype(np.intp)]
+        return encode_png(rgba)
+
+    def save(self, path: Path) -> None:
+        """Store the heatmap compressed, replacing the file atomically"""
+        arrays = {
+            "max_zoom": np.array(self.max_zoom),
+            "route_ids": np.fromiter(self.route_ids, dtype=np.int64),
+        }
+        for zoom, (keys, counts) in enumerate(self.levels):
+            arrays[f"keys_{zoom}"] = keys
+            arrays[f"counts_{zoom}"] = counts
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: Path, max_zoom: int = HEATMAP_MAX_ZOOM) -> Optional["Heatmap"]:
+        """
+        Load a stored heatmap.
+
+        Returns:
+            The heatmap, or None if there is no file or it has another max zoom
+        """
+        if not path.exists():
+            return None
+
+        with np.load(path) as arrays:
+            if int(arrays["max_zoom"]) != max_zoom:
+                return None
+
+            heatmap = cls(max_zoom)
+            heatmap.route_ids = set(arrays["route_ids"].tolist())
+            heatmap.levels = [
+                (arrays[f"keys_{zoom}"], arrays[f"counts_{zoom}"])
+                for zoom in range(max_zoom + 1)
+            ]
+        return heatmap
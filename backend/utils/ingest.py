@@ -0,0 +1,227 @@
+"""
+Bulk processing of GPX files, and of the other track file formats that
+utils.parsers recognizes.
+
+Parses the files in a pool of worker processes, so the XML parsing of many
+files runs on all cores, and streams the derived route data back as the files
+finish. The route data is cached on disk by the content hash of the file, so
+a file is only parsed once per content. Writing the results is left to the
+caller.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import zipfile
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from utils.route import SIMPLIFY_TOLERANCES, RouteGeometry
+
+# Files handed to a worker at a time, to keep the overhead per task low
+GPX_CHUNK_SIZE = 4
+
+# Workers are started fresh instead of forked: the pool is also created from
+# a threadpool thread of the API, and a fork would copy the locks held by its
+# other threads and its pooled database connections into the workers
+_mp_context = multiprocessing.get_context("spawn")
+
+# Bumped when the derived route data changes, so older cache entries are
+# no longer read
+GPX_CACHE_VERSION = 1
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# (size in bytes, modification time in seconds) of a file
+FileState = Tuple[int, float]
+
+
+def get_file_state(path: Path) -> Optional[FileState]:
+    """Size and modification time of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class ProcessedGpx:
+    """
+    Route data derived from a GPX file. Points are kept as arrays, which
+    pickle and store compactly; to_columns converts them to the lists of the
+    JSON columns.
+    """
+
+    def __init__(
+        self, points: np.ndarray, simplified: Dict[str, np.ndarray], length: float
+    ):
+        self.points = points
+        self.simplified = simplified
+        self.length = length
+        geometry = RouteGeometry(points)
+        self.bounds = geometry.bounds() if len(points) else None
+        self.elevation_up, self.elevation_down = geometry.elevation_gain()
+
+    @classmethod
+    def from_geometry(cls, geometry: RouteGeometry) -> "ProcessedGpx":
+        simplified = {
+            str(tolerance): geometry.simplify(tolerance).points
+            for tolerance in SIMPLIFY_TOLERANCES
+        }
+        return cls(geometry.points, simplified, geometry.length())
+
+    def to_columns(self) -> dict:
+        """Values of the Route columns"""
+        columns = {
+            "route_points": self.points.tolist(),
+            "simplified_route_points": {
+                level: points.tolist() for level, points in self.simplified.items()
+            },
+            "elevation_up": self.elevation_up,
+            "elevation_down": self.elevation_down,
+        }
+        if self.bounds is not None:
+            (min_lat, min_lng), (max_lat, max_lng) = self.bounds
+            columns.update(
+                min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng
+            )
+        return columns
+
+
+def hash_file(path: Path) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GpxFileResult:
+    """Outcome of reading a GPX file, see GpxParseCache.read"""
+
+    def __init__(
+        self,
+        content_hash: Optional[str],
+        processed: Optional[ProcessedGpx],
+        cached: bool = False,
+        error: Optional[str] = None,
+    ):
+        self.hash = content_hash
+        self.processed = processed
+        self.cached = cached
+        self.error = error
+
+
+class GpxParseCache:
+    """
+    Parsed GPX files on disk, keyed by the content hash of the file, so a
+    file is only parsed again when its content changed. Entries are
+    immutable; they can be deleted at any time and are rebuilt on demand.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory) / f"v{GPX_CACHE_VERSION}"
+        self.hits = 0
+        self.misses = 0
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[ProcessedGpx]:
+        """Cached route data of the file with the given hash, or None"""
+        try:
+            with np.load(self.get_path(key)) as data:
+                simplified = {
+                    str(tolerance): data[f"level_{tolerance}"]
+                    for tolerance in SIMPLIFY_TOLERANCES
+                }
+                processed = ProcessedGpx(
+                    data["points"], simplified, float(data["length"])
+                )
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            # Missing, unreadable, or stored with other levels of detail
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return processed
+
+    def put(self, key: str, processed: ProcessedGpx) -> None:
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        levels = {
+            f"level_{level}": points for level, points in processed.simplified.items()
+        }
+
+        # Written to a temporary file first, workers may store the same key
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temporary, points=processed.points, length=processed.length, **levels)
+        os.replace(temporary, path)
+
+    def read(self, path: Path, known_hash: Optional[str] = None) -> GpxFileResult:
+        """
+        Route data of a GPX file, from the cache if the same content was
+        parsed before.
+
+        Args:
+            path: Path of the GPX file
+            known_hash: Hash of the content the caller already has the route
+                data of, processed is None if the file still has that content
+
+        Returns:
+            The hash of the file and its route data
+        """
+        key = hash_file(path)
+        if key == known_hash:
+            return GpxFileResult(key, None, cached=False)
+
+        processed = self.get(key)
+        if processed is not None:
+            return GpxFileResult(key, processed, cached=True)
+
+        processed = ProcessedGpx.from_geometry(RouteGeometry.from_file(path))
+        self.put(key, processed)
+        return GpxFileResult(key, processed, cached=False)
+
+
+# (key, GPX file path, hash of the content the caller has the route data of)
+GpxJob = Tuple[int, Path, Optional[str]]
+
+
+def _process_job(job: GpxJob, cache_directory: Path) -> Tuple[int, GpxFileResult]:
+    key, path, known_hash = job
+    try:
+        return key, GpxParseCache(cache_directory).read(path, known_hash)
+    except Exception as e:
+        # Exceptions do not always survive pickling, the message does
+        return key, GpxFileResult(None, None, error=f"{type(e).__name__}: {e}")
+
+
+def process_gpx_files(
+    jobs: Iterable[GpxJob], cache_directory: Path, workers: int = 1
+) -> Iterator[Tuple[int, GpxFileResult]]:
+    """
+    Read GPX files in parallel, parsing only the files that are not in the
+    parse cache.
+
+    Args:
+        jobs: (key, path, known hash) tuples. The key identifies the result,
+            e.g. a route id, see GpxParseCache.read for the known hash.
+        cache_directory: Directory of the GpxParseCache
+        workers: Number of worker processes, 1 parses in this process
+
+    Returns:
+        Iterator of (key, result) in the order the files finish. The error of
+        the result holds the message if the file failed.
+    """
+    process = partial(_process_job, cache_directory=cache_directory)
+    if workers <= 1:
+        yield from map(process, jobs)
+        return
+
+    with _mp_context.Pool(workers) as pool:
+        yield from pool.imap_unordered(process, jobs, chunksize=GPX_CHUNK_SIZE)
@@ -0,0 +1,191 @@
+"""
+Radius search of routes around a point.
+
+Points are indexed as unit vectors on the sphere in a k-d tree, so the
+straight-line (chord) distance between two vectors orders them exactly like
+the great-circle distance, without the distortion of latitude and longitude
+away from the equator.
+"""
+
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.route import LAT, LNG
+
+EARTH_RADIUS = 6_371_000.0
+
+# Points per k-d tree leaf, the leaves are searched vectorized
+KDTREE_LEAF_SIZE = 64
+
+
+def to_unit_vectors(points: np.ndarray) -> np.ndarray:
+    """Convert (N, 2+) [lat, lng, ...] points to (N, 3) unit vectors"""
+    lat = np.radians(points[:, LAT])
+    lng = np.radians(points[:, LNG])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def chord_length(distance: float) -> float:
+    """Straight-line distance on the unit sphere of a distance in meters"""
+    return 2 * math.sin(min(distance / EARTH_RADIUS, math.pi) / 2)
+
+
+class KDTree:
+    """
+    Static k-d tree over 3-D points.
+
+    Nodes split at the median of the axis with the largest spread and keep
+    their bounding box. The points are reordered so every node covers a
+    contiguous range, which lets a query gather all matching leaves with one
+    vectorized distance computation.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = KDTREE_LEAF_SIZE):
+        """
+        Args:
+            points: (N, 3) array
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        order = np.arange(len(points))
+
+        # Per node: range of the reordered points, bounding box and children
+        self.ranges: List[Tuple[int, int]] = []
+        self.boxes: List[Tuple[Tuple[float, ...], Tuple[float, ...]]] = []
+        self.children: List[Tuple[int, int] | None] = []
+
+        if len(points):
+            stack = [(0, len(points), None, 0)]
+            while stack:
+                start, end, parent, side = stack.pop()
+                node = len(self.ranges)
+                if parent is not None:
+                    left, right = self.children[parent]
+                    self.children[parent] = (node, right) if side == 0 else (left, node)
+
+                members = points[order[start:end]]
+                low, high = members.min(axis=0), members.max(axis=0)
+                self.ranges.append((start, end))
+                self.boxes.append((tuple(low.tolist()), tuple(high.tolist())))
+                self.children.append(None)
+                if end - start <= leaf_size:
+                    continue
+
+                axis = int(np.argmax(high - low))
+                middle = (end - start) // 2
+                partition = np.argpartition(members[:, axis], middle)
+                order[start:end] = order[start:end][partition]
+                self.children[node] = (-1, -1)
+                stack.append((start + middle, end, node, 1))
+                stack.append((start, start + middle, node, 0))
+
+        self.order = order
+        self.points = points[order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_radius(
+        self, center: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the points within a radius of a point.
+
+        Args:
+            center: (3,) point
+            radius: Euclidean distance
+
+        Returns:
+            Indices of the points in the array the tree was built from and
+            their squared distances, in no particular order
+        """
+        if not self.ranges:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        cx, cy, cz = (float(value) for value in center)
+        radius_squared = radius * radius
+        starts, ends = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            (lx, ly, lz), (hx, hy, hz) = self.boxes[node]
+            dx = lx - cx if cx < lx else cx - hx if cx > hx else 0.0
+            dy = ly - cy if cy < ly else cy - hy if cy > hy else 0.0
+            dz = lz - cz if cz < lz else cz - hz if cz > hz else 0.0
+            if dx * dx + dy * dy + dz * dz > radius_squared:
+                continue
+
+            children = self.children[node]
+            if children is None:
+                start, end = self.ranges[node]
+                # Leaves are visited in order, so neighbours merge into a range
+                if ends and ends[-1] == start:
+                    ends[-1] = end
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            else:
+                stack.append(children[1])
+                stack.append(children[0])
+
+        if not starts:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        # Indices of all candidate ranges at once
+        starts, ends = np.array(starts), np.array(ends)
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        candidates = offsets + np.arange(lengths.sum())
+
+        distances = ((self.points[candidates] - center) ** 2).sum(axis=1)
+        within = distances <= radius_squared
+        return self.order[candidates[within]], distances[within]
+
+
+class NearbyIndex:
+    """
+    Index of route points for radius searches. A route may have one point,
+    e.g. its start, or many points along the route.
+    """
+
+    def __init__(self, route_ids: np.ndarray, points: np.ndarray):
+        """
+        Args:
+            route_ids: (N,) route id of every point
+            points: (N, 2) array of [lat, lng] points
+        """
+        self.route_ids = np.asarray(route_ids, dtype=np.int64)
+        self.tree = KDTree(
+            to_unit_vectors(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        )
+        self.route_count = len(np.unique(self.route_ids))
+
+    def __len__(self):
+        return self.route_count
+
+    def query(self, lat: float, lng: float, radius: float) -> List[Tuple[int, float]]:
+        """
+        Find the routes with a point within a radius.
+
+        Args:
+            radius: Distance in meters
+
+        Returns:
+            (route id, distance in meters to its closest point) pairs, closest
+            first
+        """
+        center = to_unit_vectors(np.array([[lat, lng]], dtype=np.float64))[0]
+        indices, distances = self.tree.query_radius(center, chord_length(radius))
+        if not len(indices):
+            return []
+
+        # Closest point of every route: first occurrence by distance
+        order = np.argsort(distances, kind="stable")
+        route_ids = self.route_ids[indices[order]]
+        _, first = np.unique(route_ids, return_index=True)
+        first.sort()
+
+        meters = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(distances[order][first]) / 2)
+        return list(zip(route_ids[first].tolist(), meters.tolist()))
@@ -0,0 +1,87 @@
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, key: List) -> str:
+    """
+    Encode the sort order and the sort key of the last row of a page into an
+    opaque cursor token.
+    """
+    data = json.dumps({"s": sort, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, List]:
+    """
+    Decode a cursor token created by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        sort, key = data["s"], data["k"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(sort, str) or not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+
+    return sort, key
+
+
+def _is_key_value(value, value_type: type) -> bool:
+    # bool is a subclass of int, and a float sort value may have been given
+    # as an integer
+    if isinstance(value, bool):
+        return False
+    if value_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, value_type)
+
+
+def resolve_page(
+    sort: Optional[str],
+    cursor: Optional[str],
+    sort_keys: Dict[str, Tuple[type, ...]],
+) -> Tuple[str, Optional[List]]:
+    """
+    Determine the sort order and the key to continue after from the request.
+
+    Args:
+        sort: Requested sort order, defaults to the first of sort_keys
+        cursor: Cursor token of the previous page
+        sort_keys: Supported sort orders, with the type of every value of
+            their sort key
+
+    Returns:
+        The sort order and the sort key of the last row of the previous page
+
+    Raises:
+        ValueError: For unknown sort orders, a cursor of another sort order or
+            a cursor whose key does not match its sort order
+    """
+    after = None
+    if cursor:
+        cursor_sort, after = decode_cursor(cursor)
+        if sort and sort != cursor_sort:
+            raise ValueError("Cursor belongs to another sort order")
+        sort = cursor_sort
+
+    sort = sort or next(iter(sort_keys))
+    if sort not in sort_keys:
+        raise ValueError(f"Unknown sort order: {sort}")
+
+    if after is not None:
+        key_types = sort_keys[sort]
+        if len(after) != len(key_types) or not all(
+            _is_key_value(value, value_type)
+            for value, value_type in zip(after, key_types)
+        ):
+            raise ValueError("Invalid cursor")
+
+    return sort, after
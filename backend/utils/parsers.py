@@ -0,0 +1,130 @@
+"""
+Registry of the track file parsers.
+
+The parser of a file is picked by its signature, the first bytes of the
+file, so files are read right whatever their name or extension. Every parser
+streams through the file and returns a Track with the same arrays.
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+from utils.fit import is_fit, parse_fit_track
+from utils.geojson import is_geojson, parse_geojson_track
+from utils.gpx import parse_gpx_track
+from utils.tcx import parse_tcx_track
+from utils.tracks import Track, TrackSource, read_head
+
+# Bytes read from the start of a file to recognize its format
+SIGNATURE_SIZE = 1024
+
+# First element of an XML document, skipping the declaration and comments
+_XML_ROOT = re.compile(rb"<(?:[\w.-]+:)?([A-Za-z_][\w.-]*)")
+
+
+def get_xml_root(head: bytes) -> Optional[str]:
+    """Local name of the root element of an XML file, None if not XML"""
+    head = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if not head.startswith(b"<"):
+        return None
+
+    # Comments may mention elements, so they are skipped first
+    head = re.sub(rb"<!--.*?-->", b"", head, flags=re.DOTALL)
+    match = _XML_ROOT.search(head)
+    return match.group(1).decode() if match else None
+
+
+class TrackParser:
+    """
+    Parser of a track file format.
+
+    Attributes:
+        name: Name of the format
+        extensions: File extensions the format is usually stored with
+        matches: Whether the first SIGNATURE_SIZE bytes of a file are of
+            the format
+        parse: Parses a file of the format
+    """
+
+    def __init__(
+        self,
+        name: str,
+        extensions: Tuple[str, ...],
+        matches: Callable[[bytes], bool],
+        parse: Callable[[TrackSource], Track],
+    ):
+        self.name = name
+        self.extensions = extensions
+        self.matches = matches
+        self.parse = parse
+
+    def __repr__(self):
+        return f"TrackParser(name={self.name})"
+
+
+TRACK_PARSERS: List[TrackParser] = []
+
+
+def register_parser(parser: TrackParser) -> TrackParser:
+    """Add a parser, it is tried after the parsers registered before"""
+    TRACK_PARSERS.append(parser)
+    return parser
+
+
+def get_track_file_extensions() -> List[str]:
+    """File extensions of all registered formats"""
+    return [extension for parser in TRACK_PARSERS for extension in parser.extensions]
+
+
+def get_parser(source: TrackSource) -> TrackParser:
+    """
+    Pick the parser of a track file by its signature.
+
+    Args:
+        source: File contents as bytes, or the path of a file
+
+    Raises:
+        ValueError: If no registered parser recognizes the file
+    """
+    head = read_head(source, SIGNATURE_SIZE)
+    for parser in TRACK_PARSERS:
+        if parser.matches(head):
+            return parser
+
+    raise ValueError("Unknown track file format")
+
+
+def parse_track(source: TrackSource) -> Track:
+    """
+    Parse a track file of any registered format.
+
+    Args:
+        source: File contents as bytes, or the path of a file
+
+    Returns:
+        The track, elevation 0 and time NaN where a point has none
+
+    Raises:
+        ValueError: If the format is unknown or the file is malformed
+        xml.etree.ElementTree.ParseError: If an XML file is not well-formed
+    """
+    return get_parser(source).parse(source)
+
+
+register_parser(TrackParser("fit", (".fit",), is_fit, parse_fit_track))
+register_parser(
+    TrackParser(
+        "gpx", (".gpx",), lambda head: get_xml_root(head) == "gpx", parse_gpx_track
+    )
+)
+register_parser(
+    TrackParser(
+        "tcx",
+        (".tcx",),
+        lambda head: get_xml_root(head) == "TrainingCenterDatabase",
+        parse_tcx_track,
+    )
+)
+register_parser(
+    TrackParser("geojson", (".geojson", ".json"), is_geojson, parse_geojson_track)
+)
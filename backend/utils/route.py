@@ -1,41 +1,195 @@
-import xml.etree.ElementTree as ET
-from typing import List, Tuple
+import math
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
-LAT = 0
-LNG = 1
-ELE = 2
+import numpy as np
 
+from utils.parsers import parse_track
+from utils.tracks import ELE, LAT, LNG, TrackSource
+
+# Douglas-Peucker tolerances (in degrees) of the precomputed levels of detail,
+# ordered from coarse to fine. 0.01 degrees is roughly 1 km, 0.0001 roughly 10 m.
+SIMPLIFY_TOLERANCES: List[float] = [0.01, 0.001, 0.0001]
+
+TILE_SIZE = 256
+
+EARTH_RADIUS = 6_371_000
+
+# Array-like of [latitude, longitude, elevation] points: nested lists as stored
+# in the JSON columns, or an (N, 3) array
+PointsLike = Union["RouteGeometry", np.ndarray, Sequence[Sequence[float]]]
 
-def get_track_points(file_string: str) -> List[Tuple[float, float, float]]:
-    """
-    Parse GPX file string and extract track points with elevation.
 
-    Args:
-        file_string: GPX file contents as string
+def _simplify_mask(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker on (lat, lng) coordinates.
 
     Returns:
-        List of tuples containing (longitude, latitude, elevation)
+        Boolean mask of the points that have to be kept
+    """
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        segment = xy[end] - xy[start]
+        offsets = xy[start + 1 : end] - xy[start]
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = (
+                np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+            )
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+class RouteGeometry:
+    """
+    Track of a route as an (N, 3) float64 array of [latitude, longitude,
+    elevation] points.
+
+    Everything that derives from the points (bounding box, length, elevation
+    gain, levels of detail) is computed on the array. Nested lists only exist at the JSON
+    boundary: the route_points columns and the API responses.
     """
-    root = ET.fromstring(file_string)
-    track_points = root.findall(".//{*}trkpt")  # Use {*} for any namespace
-    points = []
 
-    for track_point in track_points:
-        longitude = float(track_point.get("lon", "0"))
-        latitude = float(track_point.get("lat", "0"))
-        elevation = 0.0
+    def __init__(self, points: PointsLike = ()):
+        if isinstance(points, RouteGeometry):
+            points = points.points
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    @classmethod
+    def from_file(cls, source: TrackSource) -> "RouteGeometry":
+        """
+        Geometry of the points of a track file of any registered format
+        (GPX, TCX, FIT, GeoJSON), see parse_track
+        """
+        return cls(parse_track(source).points)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @property
+    def lat(self) -> np.ndarray:
+        return self.points[:, LAT]
+
+    @property
+    def lng(self) -> np.ndarray:
+        return self.points[:, LNG]
+
+    @property
+    def ele(self) -> np.ndarray:
+        return self.points[:, ELE]
 
-        try:
-            ele = track_point.find(".//{*}ele")
-            if ele is not None and ele.text:
-                elevation = float(ele.text)
-        except Exception as e:
-            print(f"Error parsing elevation: {e}")
+    def bounds(self) -> Tuple[List[float], List[float]]:
+        """
+        Bounding box of the track.
 
-        points.append([latitude, longitude, elevation])
+        Returns:
+            ([min_lat, min_lng], [max_lat, max_lng])
 
-    return points
+        Raises:
+            ValueError: If the track has no points
+        """
+        if not len(self):
+            raise ValueError("Empty geometry has no bounds")
 
+        xy = self.points[:, [LAT, LNG]]
+        return xy.min(axis=0).tolist(), xy.max(axis=0).tolist()
+
+    def segment_lengths(self) -> np.ndarray:
+        """Great-circle length in meters of every segment, haversine formula"""
+        lat = np.radians(self.lat)
+        lng = np.radians(self.lng)
+        d_lat = np.diff(lat)
+        d_lng = np.diff(lng)
+        a = (
+            np.sin(d_lat / 2) ** 2
+            + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(d_lng / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def length(self) -> float:
+        """Length of the track in meters"""
+        return float(self.segment_lengths().sum())
+
+    def elevation_gain(self) -> Tuple[float, float]:
+        """
+        Total ascent and descent of the track.
+
+        Returns:
+            (up, down) in meters, both positive
+        """
+        steps = np.diff(self.ele)
+        return (
+            float(np.clip(steps, 0, None).sum()),
+            float(np.clip(-steps, 0, None).sum()),
+        )
+
+    def simplify(self, tolerance: float) -> "RouteGeometry":
+        """
+        Simplify the track with the Douglas-Peucker algorithm.
+
+        Distances are measured on (lat, lng) only; the elevation of every kept
+        point is carried along unchanged.
+
+        Args:
+            tolerance: Maximum deviation in degrees of the simplified track
+
+        Returns:
+            Geometry of the subset of points that has to be kept
+        """
+        if len(self) < 3:
+            return RouteGeometry(self.points.copy())
+
+        keep = _simplify_mask(self.points[:, [LAT, LNG]], tolerance)
+        return RouteGeometry(self.points[keep])
+
+    def simplified_levels(self) -> Dict[str, List[List[float]]]:
+        """
+        Precompute the simplified levels of detail of the track.
+
+        Returns:
+            Dictionary mapping each tolerance in SIMPLIFY_TOLERANCES (as
+            string, so it survives a JSON round trip) to the simplified points
+        """
+        return {
+            str(tolerance): self.simplify(tolerance).tolist()
+            for tolerance in SIMPLIFY_TOLERANCES
+        }
+
+    def tolist(self) -> List[List[float]]:
+        """Points as nested lists, for the JSON columns and responses"""
+        return self.points.tolist()
+
+
+def zoom_to_tolerance(zoom: float) -> float:
+    """Return the size in degrees of one map pixel at the given zoom level"""
+    return 360 / (TILE_SIZE * 2**zoom)
+
+
+def select_tolerance(tolerance: Optional[float]) -> Optional[float]:
+    """
+    Pick the coarsest precomputed tolerance that is still at least as detailed
+    as the requested one.
+
+    Returns:
+        One of SIMPLIFY_TOLERANCES, or None if the full resolution is needed
+    """
+    if tolerance is None:
+        return None
 
-def get_min_max(points: List[Tuple[float, float, float]], key: int):
-    return min(point[key] for point in points), max(point[key] for point in points)
+    candidates = [t for t in SIMPLIFY_TOLERANCES if t <= tolerance]
+    return max(candidates) if candidates else None
@@ -0,0 +1,618 @@
+import math
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from utils.route import LAT, LNG
+
+# Size in degrees of a segment index grid cell, roughly 5 km
+GRID_CELL_SIZE = 0.05
+
+# Cells per side of the grid that classifies the inside of a polygon
+POLYGON_GRID_SIZE = 512
+
+Cell = Tuple[int, int]
+
+
+def segments_intersect_box(
+    points: np.ndarray, min_bounds: List[float], max_bounds: List[float]
+) -> np.ndarray:
+    """
+    Vectorized Liang-Barsky test of the segments of a line against a box.
+
+    Args:
+        points: (N, 2+) array of [latitude, longitude, ...] points
+        min_bounds: [min_lat, min_lng]
+        max_bounds: [max_lat, max_lng]
+
+    Returns:
+        Boolean array with for each of the N - 1 segments whether it
+        intersects the box
+    """
+    start = points[:-1, [LAT, LNG]]
+    delta = points[1:, [LAT, LNG]] - start
+
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    inside = np.ones(len(start), dtype=bool)
+
+    for axis in (LAT, LNG):
+        for p, q in (
+            (-delta[:, axis], start[:, axis] - min_bounds[axis]),
+            (delta[:, axis], max_bounds[axis] - start[:, axis]),
+        ):
+            parallel = p == 0
+            inside &= ~(parallel & (q < 0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(parallel, 0, q / np.where(parallel, 1, p))
+            t0 = np.where(p < 0, np.maximum(t0, t), t0)
+            t1 = np.where(p > 0, np.minimum(t1, t), t1)
+
+    return inside & (t0 <= t1)
+
+
+def line_intersects_box(
+    points: np.ndarray, min_bounds: List[float], max_bounds: List[float]
+) -> bool:
+    """Whether any part of a line lies within the box"""
+    if len(points) == 0:
+        return False
+    if len(points) == 1:
+        return bool(
+            min_bounds[LAT] <= points[0, LAT] <= max_bounds[LAT]
+            and min_bounds[LNG] <= points[0, LNG] <= max_bounds[LNG]
+        )
+    return bool(segments_intersect_box(points, min_bounds, max_bounds).any())
+
+
+def expand_bounds(
+    min_bounds: List[float], max_bounds: List[float], margin: float
+) -> Tuple[List[float], List[float]]:
+    """Grow bounds on every side by a fraction of their size"""
+    lat_margin = (max_bounds[LAT] - min_bounds[LAT]) * margin
+    lng_margin = (max_bounds[LNG] - min_bounds[LNG]) * margin
+    return (
+        [min_bounds[LAT] - lat_margin, min_bounds[LNG] - lng_margin],
+        [max_bounds[LAT] + lat_margin, max_bounds[LNG] + lng_margin],
+    )
+
+
+def clip_points(
+    points: List[List[float]], min_bounds: List[float], max_bounds: List[float]
+) -> List[List[float]]:
+    """
+    Trim a line to the stretch between the first and the last segment that
+    intersects the box, so it stays a single line.
+
+    Args:
+        points: List of [latitude, longitude, elevation] points
+        min_bounds: [min_lat, min_lng]
+        max_bounds: [max_lat, max_lng]
+
+    Returns:
+        The trimmed points, or an empty list if the line misses the box
+    """
+    if len(points) < 2:
+        return points
+
+    hits = np.flatnonzero(
+        segments_intersect_box(np.asarray(points), min_bounds, max_bounds)
+    )
+    if len(hits) == 0:
+        return []
+
+    return points[hits[0] : hits[-1] + 2]
+
+
+def _expand(low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expand ranges into one array, for vectorized loops over ranges.
+
+    Returns:
+        For every value in the ranges low[i] to high[i] inclusive, the index
+        i of its range and its offset from low[i]
+    """
+    counts = np.maximum(high - low + 1, 0)
+    items = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(items)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return items, offsets
+
+
+def _orientation(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Sign of the turn a -> b -> c, broadcast over the leading axes"""
+    return np.sign(
+        (b[..., LAT] - a[..., LAT]) * (c[..., LNG] - a[..., LNG])
+        - (b[..., LNG] - a[..., LNG]) * (c[..., LAT] - a[..., LAT])
+    )
+
+
+class Polygon:
+    """
+    GeoJSON Polygon or MultiPolygon, prepared for vectorized point in polygon
+    and segment intersection tests.
+
+    The bounds of the polygon are divided into a grid of POLYGON_GRID_SIZE
+    cells per side, and every cell lists the edges that pass through it.
+    Whether the center of a cell is inside is decided once for all cells, by
+    the even-odd rule along the center line of each row. A point is then
+    inside if its cell center is, unless the line from the point to the center
+    crosses an odd number of the edges of the cell, and a segment can only
+    cross the edges of the cells it touches. So each test only looks at a few
+    edges, also for polygons with thousands of vertices. Holes and parts
+    follow the even-odd rule as well, so rings must not overlap.
+    """
+
+    def __init__(self, rings: List[np.ndarray], grid_size: int = POLYGON_GRID_SIZE):
+        """
+        Args:
+            rings: (N, 2) arrays of [lat, lng] vertices, closed or not
+        """
+        starts, ends = [], []
+        for ring in rings:
+            if len(ring) < 3:
+                raise ValueError("Polygon rings need at least 3 positions")
+            closed = np.vstack((ring, ring[:1]))
+            starts.append(closed[:-1])
+            ends.append(closed[1:])
+        if not starts:
+            raise ValueError("Polygon has no rings")
+
+        self.starts = np.concatenate(starts)
+        self.ends = np.concatenate(ends)
+        self.edge_low = np.minimum(self.starts, self.ends)
+        self.edge_high = np.maximum(self.starts, self.ends)
+        vertices = np.concatenate(rings)
+        self.min_bounds = vertices.min(axis=0).tolist()
+        self.max_bounds = vertices.max(axis=0).tolist()
+
+        self.grid_size = grid_size
+        self.cell_size = [
+            (self.max_bounds[axis] - self.min_bounds[axis]) / grid_size or 1.0
+            for axis in (LAT, LNG)
+        ]
+        self._index_edges()
+        self._classify_cells()
+
+    @classmethod
+    def from_geojson(cls, geometry: dict) -> "Polygon":
+        """
+        Build a polygon from a GeoJSON Polygon, MultiPolygon or a Feature with
+        one of these as geometry. Positions are [lng, lat].
+
+        Raises:
+            ValueError: If the geometry is not a valid polygon
+        """
+        if not isinstance(geometry, dict):
+            raise ValueError("GeoJSON geometry must be an object")
+        if geometry.get("type") == "Feature":
+            geometry = geometry.get("geometry") or {}
+
+        geometry_type = geometry.get("type")
+        coordinates = geometry.get("coordinates")
+        if geometry_type == "Polygon":
+            polygons = [coordinates]
+        elif geometry_type == "MultiPolygon":
+            polygons = coordinates
+        else:
+            raise ValueError("GeoJSON geometry must be a Polygon or MultiPolygon")
+
+        try:
+            rings = [
+                np.asarray(ring, dtype=np.float64)[:, [LNG, LAT]]
+                for polygon in polygons
+                for ring in polygon
+            ]
+        except (TypeError, ValueError, IndexError):
+            raise ValueError("Invalid GeoJSON polygon coordinates")
+        return cls(rings)
+
+    def _index_edges(self) -> None:
+        """List the edges per cell, as one array with the offsets per cell"""
+        # Split the edges in pieces of at most one cell, the cells of the
+        # corners of a piece then cover every cell it passes through
+        deltas = self.ends - self.starts
+        steps = np.abs(deltas / self.cell_size).max(axis=1)
+        steps = np.maximum(np.ceil(steps), 1).astype(np.int64)
+        edges, offsets = _expand(np.zeros(len(steps), dtype=np.int64), steps - 1)
+        piece_starts = self._cells(
+            self.starts[edges] + (offsets / steps[edges])[:, None] * deltas[edges]
+        )
+        piece_ends = self._cells(
+            self.starts[edges] + ((offsets + 1) / steps[edges])[:, None] * deltas[edges]
+        )
+
+        cell_edges = np.unique(
+            np.concatenate(
+                [
+                    (rows[:, LAT] * self.grid_size + columns[:, LNG]) * len(steps)
+                    + edges
+                    for rows in (piece_starts, piece_ends)
+                    for columns in (piece_starts, piece_ends)
+                ]
+            )
+        )
+        cells, self.cell_edges = np.divmod(cell_edges, len(steps))
+        self.cell_offsets = np.searchsorted(
+            cells, np.arange(self.grid_size * self.grid_size + 1)
+        )
+
+        # Summed area table of the cells with edges, to count them in a range
+        boundary = np.diff(self.cell_offsets).reshape(self.grid_size, -1) > 0
+        self.boundary_sums = np.zeros(
+            (self.grid_size + 1, self.grid_size + 1), dtype=np.int32
+        )
+        self.boundary_sums[1:, 1:] = boundary.cumsum(axis=0).cumsum(axis=1)
+
+    def _classify_cells(self) -> None:
+        """
+        Decide for every cell center whether it is inside, by the number of
+        edges crossing the center line of its row right of it. The crossings
+        of all rows are sorted into one array, row by row.
+        """
+        size = self.grid_size
+        lat_size = self.cell_size[LAT]
+        self.centers = [
+            self.min_bounds[axis] + (np.arange(size) + 0.5) * self.cell_size[axis]
+            for axis in (LAT, LNG)
+        ]
+
+        # Rows whose center line lies within the latitude range of each edge
+        low_rows = np.ceil(
+            (self.edge_low[:, LAT] - self.min_bounds[LAT]) / lat_size - 0.5
+        )
+        high_rows = np.floor(
+            (self.edge_high[:, LAT] - self.min_bounds[LAT]) / lat_size - 0.5
+        )
+        low_rows = np.clip(low_rows, 0, size).astype(np.int64)
+        high_rows = np.clip(high_rows, -1, size - 1).astype(np.int64)
+        spanning = np.flatnonzero(high_rows >= low_rows)
+        items, offsets = _expand(low_rows[spanning], high_rows[spanning])
+        rows = low_rows[spanning][items] + offsets
+        edges = spanning[items]
+
+        start, end = self.starts[edges], self.ends[edges]
+        lat = self.centers[LAT][rows]
+        straddles = (start[:, LAT] > lat) != (end[:, LAT] > lat)
+        start, end, lat, rows = (
+            start[straddles],
+            end[straddles],
+            lat[straddles],
+            rows[straddles],
+        )
+        crossing = start[:, LNG] + (lat - start[:, LAT]) * (
+            end[:, LNG] - start[:, LNG]
+        ) / (end[:, LAT] - start[:, LAT])
+
+        width = self.max_bounds[LNG] - self.min_bounds[LNG] + 1
+        keys = np.sort(rows * width + (crossing - self.min_bounds[LNG]))
+        cell_rows, cell_columns = np.divmod(np.arange(size * size), size)
+        cell_keys = cell_rows * width + (
+            self.centers[LNG][cell_columns] - self.min_bounds[LNG]
+        )
+        right = np.searchsorted(keys, (cell_rows + 1) * width) - np.searchsorted(
+            keys, cell_keys, side="right"
+        )
+        self.inside = right % 2 == 1
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        """Grid cells of [lat, lng] points as (N, 2) [row, column]"""
+        cells = np.floor((points[:, [LAT, LNG]] - self.min_bounds) / self.cell_size)
+        return np.clip(cells, 0, self.grid_size - 1).astype(np.int64)
+
+    def _edge_pairs(
+        self, items: np.ndarray, cells: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(item, edge) pairs of the edges in the cell of every item"""
+        low = self.cell_offsets[cells]
+        pairs, offsets = _expand(low, self.cell_offsets[cells + 1] - 1)
+        return items[pairs], self.cell_edges[low[pairs] + offsets]
+
+    def _count_edge_cells(
+        self, low_cells: np.ndarray, high_cells: np.ndarray
+    ) -> np.ndarray:
+        """Number of cells with edges in the cell ranges low to high inclusive"""
+        sums = self.boundary_sums
+        return (
+            sums[high_cells[:, LAT] + 1, high_cells[:, LNG] + 1]
+            - sums[low_cells[:, LAT], high_cells[:, LNG] + 1]
+            - sums[high_cells[:, LAT] + 1, low_cells[:, LNG]]
+            + sums[low_cells[:, LAT], low_cells[:, LNG]]
+        )
+
+    def classify_boxes(
+        self, low: np.ndarray, high: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the boxes that lie entirely inside or outside the polygon,
+        because they fall within its bounds and only cover cells without
+        edges.
+
+        Args:
+            low: (N, 2) array of [min_lat, min_lng]
+            high: (N, 2) array of [max_lat, max_lng]
+
+        Returns:
+            Boolean arrays with for each box whether it is on one side of the
+            polygon, and if so whether that is the inside
+        """
+        low_cells, high_cells = self._cells(low), self._cells(high)
+        uniform = (
+            (low >= self.min_bounds).all(axis=1)
+            & (high <= self.max_bounds).all(axis=1)
+            & (self._count_edge_cells(low_cells, high_cells) == 0)
+        )
+        inside = self.inside[low_cells[:, LAT] * self.grid_size + low_cells[:, LNG]]
+        return uniform, uniform & inside
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        Vectorized even-odd point in polygon test.
+
+        Args:
+            points: (N, 2+) array of [lat, lng, ...] points
+
+        Returns:
+            Boolean array with for each point whether it lies inside
+        """
+        inside = np.zeros(len(points), dtype=bool)
+        candidates = np.flatnonzero(
+            (points[:, LAT] >= self.min_bounds[LAT])
+            & (points[:, LAT] <= self.max_bounds[LAT])
+            & (points[:, LNG] >= self.min_bounds[LNG])
+            & (points[:, LNG] <= self.max_bounds[LNG])
+        )
+        cells = self._cells(points[candidates])
+        cell_ids = cells[:, LAT] * self.grid_size + cells[:, LNG]
+        inside[candidates] = self.inside[cell_ids]
+
+        # Flip the points separated from their cell center by an odd number
+        # of edges. Zero orientations count as negative on both sides, so a
+        # line through a vertex crosses exactly one of its edges.
+        items, edges = self._edge_pairs(np.arange(len(candidates)), cell_ids)
+        if not len(items):
+            return inside
+
+        point = points[candidates[items]][:, [LAT, LNG]]
+        row, column = np.divmod(cell_ids[items], self.grid_size)
+        center = np.column_stack((self.centers[LAT][row], self.centers[LNG][column]))
+        start, end = self.starts[edges], self.ends[edges]
+        crossed = (
+            (_orientation(point, center, start) > 0)
+            != (_orientation(point, center, end) > 0)
+        ) & (
+            (_orientation(start, end, point) > 0)
+            != (_orientation(start, end, center) > 0)
+        )
+        flips = np.bincount(items, crossed, len(candidates)) % 2 == 1
+        inside[candidates] ^= flips
+        return inside
+
+    def crosses(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Vectorized test of segments against the polygon edges.
+
+        Args:
+            starts: (N, 2+) array of the first point of every segment
+            ends: (N, 2+) array of the second point of every segment
+
+        Returns:
+            Boolean array with for each segment whether it touches or crosses
+            an edge of the polygon
+        """
+        starts, ends = starts[:, [LAT, LNG]], ends[:, [LAT, LNG]]
+        low = np.minimum(starts, ends)
+        high = np.maximum(starts, ends)
+        candidates = np.flatnonzero(
+            (high[:, LAT] >= self.min_bounds[LAT])
+            & (low[:, LAT] <= self.max_bounds[LAT])
+            & (high[:, LNG] >= self.min_bounds[LNG])
+            & (low[:, LNG] <= self.max_bounds[LNG])
+        )
+
+        # Only segments whose cells include one with edges can cross an edge
+        low_cells = self._cells(low[candidates])
+        high_cells = self._cells(high[candidates])
+        has_edges = self._count_edge_cells(low_cells, high_cells) > 0
+        candidates = candidates[has_edges]
+        low_cells, high_cells = low_cells[has_edges], high_cells[has_edges]
+
+        # Every cell in the range of each segment, then its edges
+        columns = high_cells[:, LNG] - low_cells[:, LNG] + 1
+        counts = (high_cells[:, LAT] - low_cells[:, LAT] + 1) * columns
+        items, offsets = _expand(np.zeros(len(counts), dtype=np.int64), counts - 1)
+        row_offsets, column_offsets = np.divmod(offsets, columns[items])
+        cell_ids = (low_cells[items, LAT] + row_offsets) * self.grid_size + (
+            low_cells[items, LNG] + column_offsets
+        )
+        segments, edges = self._edge_pairs(candidates[items], cell_ids)
+
+        a, b = starts[segments], ends[segments]
+        c, d = self.starts[edges], self.ends[edges]
+        hits = (
+            (low[segments] <= self.edge_high[edges]).all(axis=1)
+            & (high[segments] >= self.edge_low[edges]).all(axis=1)
+            & (_orientation(a, b, c) * _orientation(a, b, d) <= 0)
+            & (_orientation(c, d, a) * _orientation(c, d, b) <= 0)
+        )
+        return np.bincount(segments[hits], minlength=len(starts)) > 0
+
+
+class SegmentIndex:
+    """
+    Uniform grid over route segments.
+
+    Each cell holds the routes that have a segment whose bounding box touches
+    the cell. Queries collect the candidate routes from the cells covering the
+    requested bounds and confirm them with an exact segment/box test.
+    """
+
+    def __init__(self, cell_size: float = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, Set[int]] = {}
+        self.routes: Dict[int, np.ndarray] = {}
+        self.bounds: Dict[int, Tuple[float, float, float, float]] = {}
+        self.route_cells: Dict[int, Set[Cell]] = {}
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __contains__(self, route_id: int):
+        return route_id in self.routes
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def _segment_cells(self, points: np.ndarray) -> Set[Cell]:
+        cells = np.floor(points[:, [LAT, LNG]] / self.cell_size).astype(np.int64)
+        if len(cells) == 1:
+            return {tuple(cells[0].tolist())}
+
+        low = np.minimum(cells[:-1], cells[1:])
+        high = np.maximum(cells[:-1], cells[1:])
+        covered = set()
+        for (lat0, lng0), (lat1, lng1) in zip(low.tolist(), high.tolist()):
+            for lat in range(lat0, lat1 + 1):
+                for lng in range(lng0, lng1 + 1):
+                    covered.add((lat, lng))
+        return covered
+
+    def add(self, route_id: int, points: Iterable[Iterable[float]]) -> None:
+        """Add or replace the geometry of a route"""
+        self.remove(route_id)
+
+        array = np.asarray(points, dtype=np.float64)
+        if array.ndim != 2 or len(array) == 0:
+            return
+
+        cells = self._segment_cells(array)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(route_id)
+        self.routes[route_id] = array[:, [LAT, LNG]]
+        self.bounds[route_id] = (
+            *array[:, [LAT, LNG]].min(axis=0).tolist(),
+            *array[:, [LAT, LNG]].max(axis=0).tolist(),
+        )
+        self.route_cells[route_id] = cells
+
+    def remove(self, route_id: int) -> None:
+        for cell in self.route_cells.pop(route_id, ()):
+            routes = self.cells.get(cell)
+            if routes is not None:
+                routes.discard(route_id)
+                if not routes:
+                    del self.cells[cell]
+        self.routes.pop(route_id, None)
+        self.bounds.pop(route_id, None)
+
+    def query(self, min_bounds: List[float], max_bounds: List[float]) -> Set[int]:
+        """
+        Return the ids of the routes whose line intersects the bounds.
+
+        Args:
+            min_bounds: [min_lat, min_lng]
+            max_bounds: [max_lat, max_lng]
+        """
+        return {
+            route_id
+            for route_id in self._candidates(min_bounds, max_bounds)
+            if self._intersects(route_id, min_bounds, max_bounds)
+        }
+
+    def query_polygon(self, polygon: Polygon, within: bool = False) -> Set[int]:
+        """
+        Return the ids of the routes that pass through a polygon, or that lie
+        entirely within it.
+
+        Routes whose bounding box only covers polygon grid cells without
+        edges are inside or outside as a whole. The points of the other
+        candidates are tested all at once against the polygon and their
+        segments against its edges, which also catches segments crossing the
+        polygon between two points outside of it.
+        """
+        route_ids = np.fromiter(
+            self._candidates(polygon.min_bounds, polygon.max_bounds), dtype=np.int64
+        )
+        if not len(route_ids):
+            return set()
+
+        bounds = np.array([self.bounds[route_id] for route_id in route_ids.tolist()])
+        low, high = bounds[:, :2], bounds[:, 2:]
+        polygon_low, polygon_high = polygon.min_bounds, polygon.max_bounds
+        if within:
+            possible = (low >= polygon_low).all(axis=1) & (high <= polygon_high).all(
+                axis=1
+            )
+        else:
+            possible = (high >= polygon_low).all(axis=1) & (low <= polygon_high).all(
+                axis=1
+            )
+        uniform, inside = polygon.classify_boxes(low, high)
+        matches = set(route_ids[possible & uniform & inside].tolist())
+
+        route_ids = route_ids[possible & ~uniform].tolist()
+        if not route_ids:
+            return matches
+
+        lines = [self.routes[route_id] for route_id in route_ids]
+        lengths = np.array([len(line) for line in lines])
+        points = np.concatenate(lines)
+        labels = np.repeat(np.arange(len(lines)), lengths)
+
+        # Segments between consecutive points of the same route
+        same_route = labels[1:] == labels[:-1]
+        crossings = np.bincount(
+            labels[:-1][same_route],
+            polygon.crosses(points[:-1][same_route], points[1:][same_route]),
+            len(lines),
+        )
+        inside = np.bincount(labels, polygon.contains(points), len(lines))
+
+        if within:
+            exact = (inside == lengths) & (crossings == 0)
+        else:
+            exact = (inside > 0) | (crossings > 0)
+        matches.update(
+            route_id for route_id, match in zip(route_ids, exact.tolist()) if match
+        )
+        return matches
+
+    def _candidates(self, min_bounds: List[float], max_bounds: List[float]) -> Set[int]:
+        """Routes with a segment in the grid cells covering the bounds"""
+        low = self._cell(*min_bounds)
+        high = self._cell(*max_bounds)
+        cell_count = (high[0] - low[0] + 1) * (high[1] - low[1] + 1)
+
+        candidates: Set[int] = set()
+        if cell_count <= len(self.cells):
+            for lat in range(low[0], high[0] + 1):
+                for lng in range(low[1], high[1] + 1):
+                    candidates |= self.cells.get((lat, lng), set())
+        else:
+            for (lat, lng), routes in self.cells.items():
+                if low[0] <= lat <= high[0] and low[1] <= lng <= high[1]:
+                    candidates |= routes
+
+        return candidates
+
+    def _intersects(
+        self, route_id: int, min_bounds: List[float], max_bounds: List[float]
+    ) -> bool:
+        lat_min, lng_min, lat_max, lng_max = self.bounds[route_id]
+
+        # Entirely inside or entirely outside the bounds needs no segment test
+        if (
+            lat_max < min_bounds[LAT]
+            or lat_min > max_bounds[LAT]
+            or lng_max < min_bounds[LNG]
+            or lng_min > max_bounds[LNG]
+        ):
+            return False
+        if (
+            lat_min >= min_bounds[LAT]
+            and lat_max <= max_bounds[LAT]
+            and lng_min >= min_bounds[LNG]
+            and lng_max <= max_bounds[LNG]
+        ):
+            return True
+
+        return line_intersects_box(self.routes[route_id], min_bounds, max_bounds)
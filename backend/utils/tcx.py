@@ -0,0 +1,87 @@
+"""
+Streaming TCX (Garmin Training Center) parser.
+
+Reads the trackpoints of the laps of a TCX file incrementally with iterparse,
+clearing every trackpoint once it is read, like the GPX parser.
+"""
+
+import xml.etree.ElementTree as ET
+
+from utils.tracks import Track, TrackBuilder, TrackSource, open_source, parse_time
+
+# Local names of the elements the parser acts on
+_TRACK = "Track"
+_TRACK_POINT = "Trackpoint"
+_LATITUDE = "LatitudeDegrees"
+_LONGITUDE = "LongitudeDegrees"
+_ALTITUDE = "AltitudeMeters"
+_TIME = "Time"
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def parse_tcx_track(source: TrackSource) -> Track:
+    """
+    Parse the trackpoints of a TCX file. Trackpoints without a position,
+    e.g. of an indoor activity or a GPS dropout, are left out.
+
+    Args:
+        source: TCX file contents as bytes, or the path of a TCX file
+
+    Returns:
+        The track, elevation 0 and time NaN where a point has none
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the file is not well-formed XML
+        ValueError: If a coordinate is not a number
+    """
+    builder = TrackBuilder()
+
+    # Namespaced tags map to their local name, computed once per tag
+    names = {}
+    track = None
+    values = None
+
+    with open_source(source) as file:
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            tag = element.tag
+            name = names.get(tag)
+            if name is None:
+                name = names[tag] = _local_name(tag)
+
+            if event == "start":
+                if name == _TRACK_POINT:
+                    values = {}
+                elif name == _TRACK:
+                    # Read points are removed from their track as we go
+                    track = element
+                continue
+
+            if values is None:
+                continue
+            if name == _TRACK_POINT:
+                latitude = values.get(_LATITUDE)
+                longitude = values.get(_LONGITUDE)
+                if latitude and longitude:
+                    try:
+                        altitude = float(values.get(_ALTITUDE) or 0.0)
+                    except ValueError:
+                        # A malformed altitude is treated as missing
+                        altitude = 0.0
+                    builder.append(
+                        float(latitude),
+                        float(longitude),
+                        altitude,
+                        parse_time(values.get(_TIME)),
+                    )
+
+                values = None
+                element.clear()
+                if track is not None:
+                    track.clear()
+            elif name in (_LATITUDE, _LONGITUDE, _ALTITUDE, _TIME):
+                values.setdefault(name, element.text)
+
+    return builder.build()
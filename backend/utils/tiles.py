@@ -0,0 +1,255 @@
+"""
+Mapbox Vector Tile encoding of route geometries.
+
+Implements the subset of the specification that is needed for line features:
+https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+import math
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from utils.route import LAT, LNG
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MVT_LAYER = "routes"
+
+_MAX_LATITUDE = 85.0511287798
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+
+# Geometry commands and types
+_MOVE_TO = 1
+_LINE_TO = 2
+_LINESTRING = 2
+
+
+def tile_bounds(
+    z: int, x: int, y: int, buffer: int = 0
+) -> Tuple[List[float], List[float]]:
+    """
+    Return the bounds of a tile.
+
+    Args:
+        buffer: Margin around the tile in tile pixels
+
+    Returns:
+        ([min_lat, min_lng], [max_lat, max_lng])
+    """
+    n = 2**z
+    margin = buffer / MVT_EXTENT
+
+    def lat(tile_y):
+        tile_y = min(max(tile_y, 0), n)
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    def lng(tile_x):
+        return tile_x / n * 360 - 180
+
+    return (
+        [lat(y + 1 + margin), lng(x - margin)],
+        [lat(y - margin), lng(x + 1 + margin)],
+    )
+
+
+def project(
+    points: List[Tuple[float, float, float]], z: int, x: int, y: int
+) -> List[Tuple[float, float]]:
+    """Project [lat, lng, ...] points to pixel coordinates within a tile"""
+    scale = 2**z * MVT_EXTENT
+    projected = []
+
+    for point in points:
+        lat = math.radians(max(min(point[LAT], _MAX_LATITUDE), -_MAX_LATITUDE))
+        px = (point[LNG] + 180) / 360 * scale - x * MVT_EXTENT
+        py = (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * scale - y * MVT_EXTENT
+        projected.append((px, py))
+
+    return projected
+
+
+def _clip_segment(x0, y0, x1, y1, low, high):
+    """Liang-Barsky clipping of a segment to the square [low, high]"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+
+    for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+
+    return (x0 + t0 * dx, y0 + t0 * dy), (x0 + t1 * dx, y0 + t1 * dy)
+
+
+def clip_line(
+    points: List[Tuple[float, float]], buffer: int = MVT_BUFFER
+) -> List[List[Tuple[int, int]]]:
+    """
+    Clip a projected line to the tile extent plus buffer.
+
+    Returns:
+        The parts of the line inside the tile, snapped to integer coordinates
+    """
+    low, high = -buffer, MVT_EXTENT + buffer
+    parts = []
+    current: List[Tuple[int, int]] = []
+
+    def append(point):
+        snapped = (round(point[0]), round(point[1]))
+        if not current or current[-1] != snapped:
+            current.append(snapped)
+
+    for start, end in zip(points, points[1:]):
+        clipped = _clip_segment(*start, *end, low, high)
+        if clipped is None:
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+            continue
+
+        append(clipped[0])
+        append(clipped[1])
+
+        # The segment left the tile, so the next one starts a new part
+        if clipped[1] != end:
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+
+    if len(current) > 1:
+        parts.append(current)
+
+    return parts
+
+
+def _varint(value: int) -> bytes:
+    chunks = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            chunks.append(byte | 0x80)
+        else:
+            chunks.append(byte)
+            return bytes(chunks)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, data: bytes) -> bytes:
+    return _key(field, _LENGTH_DELIMITED) + _varint(len(data)) + data
+
+
+def _varint_field(field: int, value: int) -> bytes:
+    return _key(field, _VARINT) + _varint(value)
+
+
+def _packed_field(field: int, values: List[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(value) for value in values))
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        if value < 0:
+            return _varint_field(6, _zigzag(value))
+        return _varint_field(5, value)
+    if isinstance(value, float):
+        return _key(3, _FIXED64) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode())
+
+
+def _encode_geometry(parts: List[List[Tuple[int, int]]]) -> List[int]:
+    commands = []
+    cursor_x = cursor_y = 0
+
+    for part in parts:
+        for i, (px, py) in enumerate(part):
+            if i == 0:
+                commands.append(_MOVE_TO | (1 << 3))
+            elif i == 1:
+                commands.append(_LINE_TO | ((len(part) - 1) << 3))
+            commands.append(_zigzag(px - cursor_x))
+            commands.append(_zigzag(py - cursor_y))
+            cursor_x, cursor_y = px, py
+
+    return commands
+
+
+class TileLayer:
+    """Builder for a single vector tile layer of line features"""
+
+    def __init__(self, name: str = MVT_LAYER, extent: int = MVT_EXTENT):
+        self.name = name
+        self.extent = extent
+        self.features: List[bytes] = []
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, object], int] = {}
+
+    def _tags(self, properties: Dict[str, object]) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            key_index = self.keys.setdefault(key, len(self.keys))
+            value_index = self.values.setdefault((type(value), value), len(self.values))
+            tags.extend((key_index, value_index))
+        return tags
+
+    def add_line(
+        self,
+        parts: List[List[Tuple[int, int]]],
+        properties: Dict[str, object],
+        id: Optional[int] = None,
+    ) -> None:
+        """Add a (multi)line feature from parts returned by clip_line"""
+        if not parts:
+            return
+
+        feature = b""
+        if id is not None:
+            feature += _varint_field(1, id)
+        feature += _packed_field(2, self._tags(properties))
+        feature += _varint_field(3, _LINESTRING)
+        feature += _packed_field(4, _encode_geometry(parts))
+        self.features.append(feature)
+
+    def encode(self) -> bytes:
+        layer = _varint_field(15, 2) + _bytes_field(1, self.name.encode())
+        for feature in self.features:
+            layer += _bytes_field(2, feature)
+        for key in self.keys:
+            layer += _bytes_field(3, key.encode())
+        for _, value in self.values:
+            layer += _bytes_field(4, _encode_value(value))
+        layer += _varint_field(5, self.extent)
+        return layer
+
+
+def encode_tile(layers: List[TileLayer]) -> bytes:
+    """Encode layers into a vector tile, leaving out empty layers"""
+    return b"".join(
+        _bytes_field(3, layer.encode()) for layer in layers if layer.features
+    )
@@ -0,0 +1,165 @@
+"""
+Common representation of recorded tracks, whatever file format they come from.
+
+The format parsers fill a TrackBuilder point by point while they stream
+through a file, so only the arrays grow with the length of the track. Parsers
+that can estimate the number of points from the file size preallocate them.
+"""
+
+import io
+import math
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import numpy as np
+
+# Columns of the points arrays
+LAT = 0
+LNG = 1
+ELE = 2
+
+# Points a TrackBuilder has room for at least
+MIN_CAPACITY = 16
+
+# File contents, or the path of a file
+TrackSource = Union[bytes, bytearray, memoryview, str, Path]
+
+
+class Track:
+    """
+    Points of a track as arrays.
+
+    Attributes:
+        points: (N, 3) float64 array of [latitude, longitude, elevation]
+            points, elevation 0 where the point has none
+        times: (N,) float64 array of the time of every point in seconds since
+            the epoch, NaN where the point has none
+    """
+
+    def __init__(self, points: np.ndarray, times: np.ndarray):
+        self.points = points
+        self.times = times
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+
+class TrackBuilder:
+    """
+    Track points appended one by one into preallocated float64 columns, so
+    every point takes 32 bytes however many there are. The columns double
+    in size when a track has more points than the capacity it was sized for.
+
+    Args:
+        capacity: Expected number of points, e.g. estimated from the file size
+    """
+
+    def __init__(self, capacity: int = 0):
+        capacity = max(capacity, MIN_CAPACITY)
+        self.count = 0
+        self.lat = np.empty(capacity, dtype=np.float64)
+        self.lng = np.empty(capacity, dtype=np.float64)
+        self.ele = np.empty(capacity, dtype=np.float64)
+        self.time = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(
+        self, lat: float, lng: float, ele: float = 0.0, time: float = math.nan
+    ) -> None:
+        i = self.count
+        if i == len(self.lat):
+            self._grow()
+        self.lat[i] = lat
+        self.lng[i] = lng
+        self.ele[i] = ele
+        self.time[i] = time
+        self.count = i + 1
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self.lat)
+        self.lat = np.resize(self.lat, capacity)
+        self.lng = np.resize(self.lng, capacity)
+        self.ele = np.resize(self.ele, capacity)
+        self.time = np.resize(self.time, capacity)
+
+    def truncate(self, count: int) -> None:
+        """Drop the points appended after the first count points"""
+        self.count = min(self.count, count)
+
+    def build(self) -> Track:
+        """Track of the appended points"""
+        count = self.count
+        points = np.empty((count, 3), dtype=np.float64)
+        points[:, LAT] = self.lat[:count]
+        points[:, LNG] = self.lng[:count]
+        points[:, ELE] = self.ele[:count]
+        return Track(points, self.time[:count].copy())
+
+
+def get_source_size(source: TrackSource) -> int:
+    """Size in bytes of the file contents or file"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    return os.path.getsize(source)
+
+
+def open_source(source: TrackSource) -> BinaryIO:
+    """Binary file object to read the file contents or file from"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return open(source, "rb")
+
+
+def read_head(source: TrackSource, size: int) -> bytes:
+    """The first size bytes of the file contents or file"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:size])
+    with open(source, "rb") as file:
+        return file.read(size)
+
+
+@lru_cache(maxsize=16)
+def _get_day_start(date: str) -> float:
+    return datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp()
+
+
+def parse_time(text: Optional[str]) -> float:
+    """
+    Parse an ISO 8601 time, as GPX and TCX files have them.
+
+    Returns:
+        Seconds since the epoch, times without time zone taken as UTC. NaN if
+        the text is missing or malformed.
+    """
+    if not text:
+        return math.nan
+
+    text = text.strip()
+    # Fast path for UTC times like 2024-05-01T08:12:13Z, which recordings
+    # have one of per point: the date repeats, so only the time is parsed
+    if len(text) >= 20 and text[-1] == "Z" and text[10] == "T" and text[13] == ":":
+        try:
+            return (
+                _get_day_start(text[:10])
+                + int(text[11:13]) * 3600
+                + int(text[14:16]) * 60
+                + float(text[17:-1])
+            )
+        except ValueError:
+            pass
+
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        time = datetime.fromisoformat(text)
+    except ValueError:
+        return math.nan
+
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return time.timestamp()
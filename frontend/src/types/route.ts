@@ -29,8 +29,8 @@ export type RouteType = {
     distance?: number;
     source?: string;
     // duration?: number;
-    // elevationUp?: number;
-    // elevationDown?: number;
+    elevationUp?: number;
+    elevationDown?: number;
     sport?: "racebike" | "mtb_easy" | "touringbicycle" | "hike";
     routePoints: RoutePoint[];
     komoot?: {